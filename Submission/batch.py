@@ -0,0 +1,160 @@
+"""Monte Carlo comparison of the lift algorithms.
+
+One random scenario says nothing about which algorithm is better, so this runs thousands of
+independent seeded scenarios (the same ones for every algorithm) through the headless engine and
+reports the distribution of the cost, the number of stops and the wait and ride times of the customers,
+with 95% confidence intervals. The scenarios are generated, and the statistics computed, with numpy for
+all scenarios at once. Every scenario still goes through the engine on its own because the lifts decide
+their stops one after the other.
+
+    python batch.py --scenarios 5000 --floors 20 --passengers 10 --seed 1
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from engine import MechaCar, MyCar, Simulation
+from optimal import Solver
+from passengers import PassengerTable
+
+# metrics measured once per scenario
+METRICS = ("cost", "floor_count", "wait", "ride")
+
+
+def make_scenarios(scenarios, floors, passengers, seed=None):
+
+    """Draws the current and destination floors of every customer of every scenario.
+        Returns two int32 arrays of shape (scenarios, passengers)."""
+
+    rng = np.random.default_rng(seed)
+    cur_floor = rng.integers(0, floors, size=(scenarios, passengers), dtype=np.int32)
+    dst_floor = rng.integers(0, floors, size=(scenarios, passengers), dtype=np.int32)
+    return cur_floor, dst_floor
+
+
+def run_batch(scenarios=1000, floors=20, passengers=10, load=10, seed=None, cars=(MechaCar, MyCar), optimal=False,
+              **options):
+
+    """Runs every scenario with every algorithm. Returns a dict {algorithm name: {metric: array}}:
+        cost and floor_count have one value per scenario, wait and ride one value per customer
+        (shape (scenarios, passengers), nan for customers who never needed the lift).
+        If optimal, every scenario is also solved offline (see optimal.py) and gap is the relative gap of
+        the cost of every algorithm against the best solution found.
+        options are passed to Simulation (floor_time, door_time, dwell_time)."""
+
+    cur_floor, dst_floor = make_scenarios(scenarios, floors, passengers, seed)
+    results = {}
+    for car_class in cars:
+        results[car_class.__name__] = {
+            "cost": np.zeros(scenarios),
+            "floor_count": np.zeros(scenarios),
+            "wait": np.full((scenarios, passengers), np.nan),
+            "ride": np.full((scenarios, passengers), np.nan),
+        }
+        if optimal:
+            results[car_class.__name__]["gap"] = np.full(scenarios, np.nan)
+
+    for i in range(scenarios):
+        table = PassengerTable.from_columns(cur_floor[i], dst_floor[i])
+        sim = Simulation(floors, table, cars, load=load, **options).run()
+        solution = Solver(floors, table, load).solve() if optimal else None
+        for car in sim.cars:
+            result = results[car.name]
+            result["cost"][i] = car.cost
+            result["floor_count"][i] = car.floor_count
+            customers = car.allcustomer
+            arrival = np.frombuffer(customers.arrival_time, dtype=np.float64)
+            board = np.frombuffer(customers.board_time, dtype=np.float64)
+            alight = np.frombuffer(customers.alight_time, dtype=np.float64)
+            result["wait"][i] = np.where(board >= 0, board - arrival, np.nan)
+            result["ride"][i] = np.where(alight >= 0, alight - board, np.nan)
+            if solution is not None and solution.cost:
+                result["gap"][i] = solution.gap(car.cost)
+    return results
+
+
+def per_scenario(result, metric):
+
+    """Returns one value per scenario for the metric (the mean over the customers for wait and ride).
+        Scenarios where nobody used the lift are dropped."""
+
+    values = result[metric]
+    if values.ndim == 1:
+        return values
+    counts = np.sum(~np.isnan(values), axis=1)
+    sums = np.nansum(values, axis=1)
+    return sums[counts > 0] / counts[counts > 0]
+
+
+def summarize(values):
+
+    """Mean with its 95% confidence interval (normal approximation) and percentiles of the values."""
+
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"n": 0}
+    half_width = 1.96 * values.std(ddof=1) / np.sqrt(len(values)) if len(values) > 1 else np.nan
+    p5, p50, p95, p99 = np.percentile(values, [5, 50, 95, 99])
+    mean = values.mean()
+    return {"n": len(values), "mean": mean, "ci_low": mean - half_width, "ci_high": mean + half_width,
+            "p5": p5, "p50": p50, "p95": p95, "p99": p99, "max": values.max()}
+
+
+def report(results):
+
+    """Summaries of every metric of every algorithm. The per scenario mean is used for the confidence
+        interval of wait and ride, and all the customers for their percentiles. The first algorithm is
+        the reference: the paired difference of the others against it is reported as well."""
+
+    summary = {}
+    names = list(results)
+    for name in names:
+        summary[name] = {}
+        for metric in METRICS + ("gap",):
+            if metric not in results[name]:
+                continue
+            stats = summarize(per_scenario(results[name], metric))
+            pooled = summarize(results[name][metric].ravel())
+            for key in ("p5", "p50", "p95", "p99", "max"):
+                if key in pooled:
+                    stats[key] = pooled[key]
+            summary[name][metric] = stats
+    for name in names[1:]:
+        for metric in ("cost", "floor_count"):
+            diff = results[name][metric] - results[names[0]][metric]
+            summary[name][metric + "_diff"] = summarize(diff)
+    return summary
+
+
+def print_report(summary, cpu_time=None):
+    print("%-12s %-16s %10s %22s %10s %10s %10s" % ("algorithm", "metric", "mean", "95% CI", "p50", "p95", "p99"))
+    for name, metrics in summary.items():
+        for metric, stats in metrics.items():
+            if not stats["n"]:
+                continue
+            print("%-12s %-16s %10.3f %10.3f..%-10.3f %10.3f %10.3f %10.3f" % (
+                name, metric, stats["mean"], stats["ci_low"], stats["ci_high"], stats["p50"], stats["p95"], stats["p99"]))
+    if cpu_time is not None:
+        print("CPU time: %.3f s" % cpu_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the lift algorithms over many random scenarios.")
+    parser.add_argument("--scenarios", type=int, default=1000)
+    parser.add_argument("--floors", type=int, default=20)
+    parser.add_argument("--passengers", type=int, default=10)
+    parser.add_argument("--load", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--optimal", action="store_true", help="report the gap of the cost against the offline optimum")
+    args = parser.parse_args()
+
+    start = time.process_time()
+    results = run_batch(args.scenarios, args.floors, args.passengers, args.load, args.seed, optimal=args.optimal)
+    print_report(report(results), time.process_time() - start)
+
+
+if __name__ == "__main__":
+    main()
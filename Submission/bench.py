@@ -0,0 +1,350 @@
+"""Benchmarks of the engine, to measure the effect of a change in numbers.
+
+Micro benchmarks time the hot paths of a lift (next_stop, floor_initialize, register_customer) and end to end
+benchmarks run whole simulations and the drawing loop of the viewer (headless, with the dummy SDL driver),
+for buildings of 5 to 1000 floors and 10 to 1 million customers. Results are saved as JSON and can be compared
+with a baseline saved earlier: a benchmark slower than the baseline by more than the tolerance is a regression
+and makes the command fail.
+
+Every benchmark is timed as the best of several rounds, and the whole suite is run several times (--passes),
+keeping the best time: the speed of a machine drifts over seconds, and a single pass can fall in a slow moment.
+A benchmark still slower than the baseline is measured again (--retries) before it is reported.
+
+    python bench.py --out baseline.json
+    python bench.py --baseline baseline.json --tolerance 0.25
+    python bench.py --full --out full.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from collections import deque
+
+from engine import UP, MechaCar, MyCar, Simulation
+from passengers import PassengerTable
+
+FLOORS = (5, 20, 100, 1000)
+PASSENGERS = (10, 1000, 100000, 1000000)
+# default sizes, a pass takes about a minute
+QUICK_FLOORS = (5, 20, 100, 1000)
+QUICK_PASSENGERS = (10, 1000, 100000)
+# times the suite is run, every benchmark keeping its best time
+PASSES = 3
+# times a benchmark slower than the baseline is measured again before it is reported, and seconds between
+# two times, so that they do not all fall in the same slow moment of the machine
+RETRIES = 10
+RETRY_PAUSE = 1.0
+# frames drawn by the benchmark of the viewer, from the start of a scene
+FRAMES = 30
+
+
+def _number(function, min_time):
+
+    """Number of calls of function that last at least min_time, and the time of one call."""
+
+    number = 1
+    while True:
+        elapsed = _round(function, number)
+        if elapsed * number >= min_time:
+            return number, elapsed
+        number *= 2
+
+
+def _round(function, number):
+
+    """Time of one call of function, over number calls."""
+
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start) / number
+
+
+def best_time(function, repeat=7, min_time=0.05, setup=None):
+
+    """Best time (in seconds) of one call of function, over repeat rounds. Every round calls function often enough
+        to last at least min_time, so that very fast functions are not lost in the noise of the clock.
+        setup, if given, is called before every call of function (to put back the state function changes):
+        both are timed together and the best time of setup alone is taken away, the rounds of the two
+        alternating so that both best times come from the same moments of the machine."""
+
+    if setup is None:
+        number, best = _number(function, min_time)
+        for _ in range(repeat - 1):
+            best = min(best, _round(function, number))
+        return best
+
+    def both():
+        setup()
+        function()
+
+    number, best = _number(both, min_time)
+    best_setup = _round(setup, number)
+    for _ in range(repeat - 1):
+        best = min(best, _round(both, number))
+        best_setup = min(best_setup, _round(setup, number))
+    return max(best - best_setup, 0.0)
+
+
+def calibrate():
+
+    """Time of a fixed pure python loop. Comparisons with a baseline are made relative to it, so that a machine
+        (or a moment) that is slower as a whole does not look like a regression."""
+
+    def loop():
+        total = 0
+        for i in range(10000):
+            total += i * i % 7
+        return total
+
+    return best_time(loop, repeat=15)
+
+
+def bench_next_stop(floors, passengers, customers):
+
+    """Decision of the next stop by a lift in the middle of the building, going up."""
+
+    car = MyCar(floors)
+    car.add_customer(customers)
+    car.cur_floor = floors // 2
+
+    def decide():
+        car.direction = UP
+        car.next_stop()
+
+    return best_time(decide), 1
+
+
+def bench_floor_initialize(floors, passengers, customers):
+
+    """Rebuild of the queues of the floors and of the call indexes from all the customers."""
+
+    car = MyCar(floors)
+    car.add_customer(customers)
+    return best_time(car.floor_initialize), max(passengers, 1)
+
+
+def bench_register_customer(floors, passengers, customers):
+
+    """Boarding of every customer waiting to go up at the busiest floor, in a lift large enough for all of them."""
+
+    car = MyCar(floors, load=max(passengers, 1))
+    car.add_customer(customers)
+    queues = [len(queues[UP]) for queues in car.floor_list]
+    floor = queues.index(max(queues))
+    waiting = list(car.floor_list[floor][UP])
+    car.cur_floor = floor
+    car.direction = UP
+
+    def reset():
+        # puts the customers back in the queue (with as many hall calls) and takes their destinations out of the lift
+        for handle in car.elevator_customer:
+            car.calls.car.remove(car.allcustomer.dst_floor[handle])
+        car.elevator_customer = []
+        car.floor_list[floor][UP] = deque(waiting)
+        hall = car.calls.hall[UP]
+        hall.remove(floor, hall.counts[floor])
+        for _ in waiting:
+            hall.add(floor)
+
+    return best_time(car.register_customer, setup=reset), max(len(waiting), 1)
+
+
+def bench_simulation(floors, passengers, customers):
+
+    """Whole simulation of one lift delivering all the customers, from the copy of the customers by the lift.
+        The rate is in customers per second. The largest runs last seconds, so they are repeated less."""
+
+    def simulate():
+        Simulation(floors, customers, (MyCar,)).run()
+
+    return best_time(simulate, repeat=3 if passengers >= 100000 else 7), max(passengers, 1)
+
+
+def bench_viewer(floors, passengers, customers):
+
+    """Frames of the drawing loop of the viewer (without waiting for the frame rate), the first FRAMES frames of
+        a new scene every time, so every round draws the same frames. The rate is in frames per second.
+        Needs pygame; skipped without it."""
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    try:
+        import pygame
+    except ImportError:
+        return None
+    import main as viewer
+
+    pygame.init()
+    screen = pygame.display.set_mode((640, 480))
+    label = viewer.Label("", 20, (0, 0, 0), (10, 10), "topleft")
+    sim = elevators = sprites = None
+
+    def scene():
+        nonlocal sim, elevators, sprites
+        sim = Simulation(floors, customers, (MechaCar, MyCar))
+        viewport = viewer.Viewport(floors, 10, screen.get_height() - 10)
+        elevators, sprites = viewer.make_scene(screen, sim, viewport, label)
+
+    def frames():
+        for _ in range(FRAMES):
+            sim.run(until=sim.now + 1.0 / viewer.FPS * 10)
+            for elevator in elevators:
+                elevator.update_labels()
+            sprites.update(sim.now)
+            pygame.display.update(sprites.draw(screen))
+
+    # pygame is not quit: the fonts cached by the viewer would not survive it
+    return best_time(frames, setup=scene) / FRAMES, 1
+
+
+# benchmark functions: (name, function, largest number of customers it is run with)
+BENCHMARKS = [
+    ("next_stop", bench_next_stop, None),
+    ("floor_initialize", bench_floor_initialize, None),
+    ("register_customer", bench_register_customer, None),
+    ("simulation", bench_simulation, None),
+    ("viewer", bench_viewer, 1000),
+]
+BENCHMARK_FUNCTIONS = {name: function for name, function, _ in BENCHMARKS}
+
+
+def measure(name, floor, passenger, customers=None):
+
+    """Runs the benchmark name for one size. Returns its result, or None if it was skipped."""
+
+    if customers is None:
+        customers = PassengerTable.random(floor, passenger, 0)
+    measured = BENCHMARK_FUNCTIONS[name](floor, passenger, customers)
+    if measured is None:
+        return None
+    seconds, items = measured
+    return {"name": name, "floors": floor, "passengers": passenger, "seconds": seconds,
+            "per_second": items / seconds if seconds > 0 else None}
+
+
+def keep_best(results, key, result):
+    if result is not None and (key not in results or result["seconds"] < results[key]["seconds"]):
+        results[key] = result
+
+
+def run(floors=QUICK_FLOORS, passengers=QUICK_PASSENGERS, names=None, passes=PASSES):
+
+    """Runs the benchmarks for every size, passes times, keeping the best time of every benchmark: the speed
+        of a machine drifts over seconds, so the rounds of one pass can all fall in a slow moment.
+        Returns the results, a dict {key: result} (the key being name/floors/passengers), and the best time
+        of calibrate, measured at the start of every pass."""
+
+    results = {}
+    calibration = None
+    for _ in range(passes):
+        seconds = calibrate()
+        calibration = seconds if calibration is None else min(calibration, seconds)
+        for passenger in passengers:
+            for floor in floors:
+                customers = PassengerTable.random(floor, passenger, 0)
+                for name, _, largest in BENCHMARKS:
+                    if names and name not in names or largest is not None and passenger > largest:
+                        continue
+                    keep_best(results, "%s/%d/%d" % (name, floor, passenger), measure(name, floor, passenger,
+                                                                                     customers))
+    for key, result in results.items():
+        print("%-40s %14.2f us %14.0f /s" % (key, result["seconds"] * 1e6, result["per_second"] or 0))
+    return results, calibration
+
+
+def save(results, calibration, path):
+    with open(path, "w") as f:
+        json.dump({"python": sys.version.split()[0], "platform": platform.platform(), "calibration": calibration,
+                   "results": results}, f, indent=1)
+
+
+def slower(results, baseline, tolerance=0.25, speed=1.0):
+
+    """Ratios {key: ratio} of the time of results to the baseline of the benchmarks slower than the baseline
+        by more than tolerance (0.25 is 25% slower). speed is how much slower the machine is now than when the
+        baseline was saved (ratio of the calibrations): times are divided by it."""
+
+    ratios = {}
+    for key, result in results.items():
+        if key in baseline and baseline[key]["seconds"]:
+            ratio = result["seconds"] / speed / baseline[key]["seconds"]
+            if ratio > 1 + tolerance:
+                ratios[key] = ratio
+    return ratios
+
+
+def confirm(results, baseline, tolerance=0.25, speed=1.0, retries=RETRIES):
+
+    """Measures again the benchmarks slower than the baseline, up to retries times, keeping their best time
+        in results: a benchmark is only reported if all its measurements are slower, not because it ran in a
+        slow moment of the machine.
+        Returns the ratios of the benchmarks still slower."""
+
+    suspects = slower(results, baseline, tolerance, speed)
+    for _ in range(retries):
+        if not suspects:
+            break
+        time.sleep(RETRY_PAUSE)
+        for key in suspects:
+            result = results[key]
+            keep_best(results, key, measure(result["name"], result["floors"], result["passengers"]))
+        suspects = slower({key: results[key] for key in suspects}, baseline, tolerance, speed)
+    return suspects
+
+
+def compare(results, baseline, tolerance=0.25, speed=1.0):
+
+    """Prints results next to a baseline. Returns the list of (key, ratio) of the benchmarks slower than the
+        baseline by more than tolerance (see slower)."""
+
+    regressions = slower(results, baseline, tolerance, speed)
+    print("%-40s %14s %14s %8s" % ("benchmark", "baseline us", "now us", "ratio"))
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result["seconds"] / speed / baseline[key]["seconds"] if baseline[key]["seconds"] else 1.0
+        print("%-40s %14.2f %14.2f %8.2f %s" % (key, baseline[key]["seconds"] * 1e6, result["seconds"] * 1e6, ratio,
+                                                  "REGRESSION" if key in regressions else ""))
+    return sorted(regressions.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the engine and compare with a baseline.")
+    parser.add_argument("--full", action="store_true", help="also run 1 million customers")
+    parser.add_argument("--floors", type=int, nargs="+", default=None)
+    parser.add_argument("--passengers", type=int, nargs="+", default=None)
+    parser.add_argument("--only", nargs="+", default=None, choices=[name for name, _, _ in BENCHMARKS])
+    parser.add_argument("--passes", type=int, default=PASSES, help="times the suite is run (best time kept)")
+    parser.add_argument("--retries", type=int, default=RETRIES,
+                        help="times a benchmark slower than the baseline is measured again")
+    parser.add_argument("--out", default=None, help="save the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON file of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    floors = args.floors or (FLOORS if args.full else QUICK_FLOORS)
+    passengers = args.passengers or (PASSENGERS if args.full else QUICK_PASSENGERS)
+    results, calibration = run(floors, passengers, args.only, args.passes)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        speed = calibration / baseline["calibration"] if baseline.get("calibration") else 1.0
+        # a machine found faster than when the baseline was saved is noise of the calibration: times are never
+        # made slower by it
+        speed = max(speed, 1.0)
+        print("machine speed against the baseline: %.2fx slower" % speed)
+        confirm(results, baseline["results"], args.tolerance, speed, args.retries)
+        regressions = compare(results, baseline["results"], args.tolerance, speed)
+    if args.out:
+        save(results, calibration, args.out)
+    if args.baseline and regressions:
+        sys.exit("%d benchmarks are slower than the baseline by more than %d%%: %s" % (
+            len(regressions), args.tolerance * 100, ", ".join(key for key, _ in regressions)))
+
+
+if __name__ == "__main__":
+    main()
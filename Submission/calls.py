@@ -0,0 +1,122 @@
+"""Indexes of the calls a lift has to serve.
+
+Floors with pending calls are kept in bitsets (a python int, bit n set means floor n has a call),
+so finding the next floor with a call above or below the lift is a couple of integer operations
+instead of a walk over every floor and every customer.
+"""
+
+
+class FloorSet:
+    """Counts the calls on every floor and keeps a bitset of the floors with at least one call,
+        and the number of calls on all the floors (total)."""
+
+    def __init__(self, floor):
+
+        """Initialisation of the class. floor is the number of floors of the building."""
+
+        self.counts = [0] * floor
+        self.mask = 0
+        self.total = 0
+
+    def add(self, floor):
+
+        """Adds a call at the given floor."""
+
+        self.counts[floor] += 1
+        self.total += 1
+        if self.counts[floor] == 1:
+            self.mask |= 1 << floor
+
+    def remove(self, floor, n=1):
+
+        """Removes n calls at the given floor."""
+
+        self.counts[floor] -= n
+        self.total -= n
+        if self.counts[floor] == 0:
+            self.mask &= ~(1 << floor)
+
+    def clear(self):
+        self.counts = [0] * len(self.counts)
+        self.mask = 0
+        self.total = 0
+
+    def __contains__(self, floor):
+        return self.mask >> floor & 1 == 1
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __len__(self):
+        return bin(self.mask).count("1")
+
+    def __iter__(self):
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def above(self, floor):
+
+        """Returns the closest floor with a call strictly above floor, or None."""
+
+        return _above(self.mask, floor)
+
+    def below(self, floor):
+
+        """Returns the closest floor with a call strictly below floor, or None."""
+
+        return _below(self.mask, floor)
+
+
+class CallIndex:
+    """Hall calls (customers waiting on a floor, one set per direction) and car calls
+        (destinations of the customers inside the lift) of one lift."""
+
+    def __init__(self, floor):
+
+        """Initialisation of the class. hall is indexed by direction (hall[1] holds the floors where someone
+            is waiting to go up, hall[0] to go down), car holds the floors where someone inside the lift wants to get out."""
+
+        self.hall = [FloorSet(floor), FloorSet(floor)]
+        self.car = FloorSet(floor)
+
+    def clear(self):
+        for calls in self.hall:
+            calls.clear()
+        self.car.clear()
+
+    def mask(self, hall=True):
+
+        """Returns the bitset of the floors with a car call, or with any call when hall is True."""
+
+        if hall:
+            return self.car.mask | self.hall[0].mask | self.hall[1].mask
+        return self.car.mask
+
+    def above(self, floor, hall=True):
+
+        """Returns the closest floor above floor with a car call (or any call when hall is True)."""
+
+        return _above(self.mask(hall), floor)
+
+    def below(self, floor, hall=True):
+
+        """Returns the closest floor below floor with a car call (or any call when hall is True)."""
+
+        return _below(self.mask(hall), floor)
+
+
+def _above(mask, floor):
+    mask >>= floor + 1
+    if not mask:
+        return None
+    return floor + (mask & -mask).bit_length()
+
+
+def _below(mask, floor):
+    mask &= (1 << floor) - 1
+    if not mask:
+        return None
+    return mask.bit_length() - 1
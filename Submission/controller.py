@@ -0,0 +1,406 @@
+"""Live dispatch controller: the engine driving lifts in real time behind a local socket.
+
+The controller keeps a group of lifts (group.GroupSimulation) whose clock follows the wall clock, the simulation
+standing in for the real lifts. Clients connect over TCP or a Unix socket and send one JSON object per line:
+
+    {"op": "hall", "id": 1, "floor": 0, "to": 12}    a customer at floor 0 going to floor 12
+    {"op": "car", "id": 2, "car": 3, "to": 5}         a customer inside lift 3 presses the button of floor 5
+    {"op": "subscribe"}                              receive the stop commands of all the lifts
+    {"op": "stats"}                                  decision latency of the controller
+
+and get back, one JSON object per line:
+
+    {"op": "assigned", "id": 1, "car": 2, "time": 12.5}      the call was given to lift 2 (time of the simulation)
+    {"op": "stop", "car": 2, "floor": 12, "eta": 31.5}      lift 2 leaves for floor 12 and arrives at eta
+    {"op": "stats", ...} or {"op": "error", "id": 1, "message": "..."}
+
+Every call is dispatched as soon as it is read, so the decision latency is one dispatch (Dispatcher.dispatch and
+the next_stop of the lifts), and the simulation is moved forward between calls in slices of at most budget
+seconds, so a busy moment never holds back the calls. Delivered customers are reclaimed (see Car.reclaim), so
+the memory of the controller does not grow with the number of calls. Stop commands are not sent to a subscriber that does not
+read them fast enough (its buffer is full): they are counted as dropped instead.
+
+The load generator replays traffic (Poisson arrivals at rising rates, or a scenario file, see record.py) and
+reports the p99 time from a call to its assignment and the highest rate the controller sustains:
+
+    python controller.py serve --floors 20 --cars 4 --port 8765
+    python controller.py load --port 8765 --floors 20 --rates 100 200 500 1000 2000 5000
+    python controller.py load --port 8765 --scenario scenario.rec --speedup 60
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from engine import CARS
+from group import DISPATCHERS, GroupSimulation
+from metrics import Histogram
+from traffic import poisson_arrivals, uniform
+
+# most time (in seconds) the simulation runs without letting the calls in
+BUDGET = 0.002
+# bytes waiting to be sent to a subscriber above which its stop commands are dropped
+WRITE_LIMIT = 1 << 20
+# rates (calls per second) tried by the load generator
+RATES = (100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class LiveSimulation(GroupSimulation):
+    """Group of lifts telling the controller every time a lift leaves for a new stop."""
+
+    def __init__(self, *args, on_stop=None, **options):
+        self.on_stop = on_stop
+        super().__init__(*args, **options)
+
+    def depart(self, car):
+        super().depart(car)
+        if car.moving and car.dep_time == self.now and self.on_stop is not None:
+            self.on_stop(car, car.next_floor, car.arr_time)
+
+
+class Controller:
+    """Lifts driven in real time (speed seconds of simulation per second) from the calls of the clients."""
+
+    def __init__(self, floors=20, cars=4, algorithm="MyCar", dispatcher="eta", speed=1.0, budget=BUDGET, **options):
+
+        """Initialisation of the class. options are passed to the simulation (load, floor_time, motion...)."""
+
+        options.setdefault("reclaim", True)
+        self.sim = LiveSimulation(floors, (), (CARS[algorithm],) * cars, dispatcher=DISPATCHERS[dispatcher],
+                                  on_stop=self.stop, **options)
+        self.floors = floors
+        self.speed = speed
+        self.budget = budget
+        self.start = time.perf_counter()
+        self.next_id = 0
+        self.subscribers = set()
+        self.latency = Histogram()
+        self.calls = 0
+        self.dropped = 0
+
+    def clock(self):
+
+        """Time of the simulation that matches the wall clock now."""
+
+        return (time.perf_counter() - self.start) * self.speed
+
+    def advance(self, budget=None):
+
+        """Handles the events of the simulation up to the wall clock, or until budget seconds have passed.
+            Returns True if the simulation has caught up with the wall clock."""
+
+        sim = self.sim
+        target = self.clock()
+        deadline = time.perf_counter() + budget if budget is not None else None
+        steps = 0
+        while sim.events and sim.events[0][0] <= target:
+            sim.step()
+            steps += 1
+            if deadline is not None and steps % 64 == 0 and time.perf_counter() > deadline:
+                return False
+        sim.now = max(sim.now, target)
+        return True
+
+    async def run(self):
+
+        """Moves the simulation forward with the wall clock, giving way to the clients between slices."""
+
+        while True:
+            caught_up = self.advance(self.budget)
+            if caught_up:
+                sim = self.sim
+                wait = (sim.events[0][0] - sim.now) / self.speed if sim.events else 0.05
+                await asyncio.sleep(min(max(wait, 0.0), 0.05))
+            else:
+                await asyncio.sleep(0)
+
+    def handle(self, message, writer):
+
+        """Handles one message of a client."""
+
+        if not isinstance(message, dict):
+            self.send(writer, {"op": "error", "id": None, "message": "not a JSON object"})
+            return
+        op = message.get("op")
+        if op == "subscribe":
+            self.subscribers.add(writer)
+            return
+        if op == "stats":
+            self.send(writer, self.stats())
+            return
+        if op not in ("hall", "car"):
+            self.send(writer, {"op": "error", "id": message.get("id"), "message": "unknown op %r" % op})
+            return
+        start = time.perf_counter()
+        try:
+            to = _integer(message["to"])
+            floor = _integer(message["floor"]) if op == "hall" else None
+            car = _integer(message["car"]) if op == "car" else None
+        except (KeyError, TypeError, ValueError) as error:
+            self.send(writer, {"op": "error", "id": message.get("id"), "message": "bad call: %s" % error})
+            return
+        if not 0 <= to < self.floors or floor is not None and not 0 <= floor < self.floors \
+                or car is not None and not 0 <= car < len(self.sim.cars):
+            self.send(writer, {"op": "error", "id": message.get("id"), "message": "no such floor or lift"})
+            return
+
+        # the call is made at the time of the wall clock, or as close to it as the budget lets the simulation go
+        self.advance(self.budget)
+        ID = self.next_id
+        self.next_id += 1
+        sim = self.sim
+        if op == "hall":
+            if floor == to:
+                self.send(writer, {"op": "assigned", "id": message.get("id"), "car": None, "time": sim.now})
+                return
+            sizes = [len(lift.allcustomer) for lift in sim.cars]
+            sim.call(floor, to, ID)
+            car = self.assigned(sizes, ID)
+        else:
+            lift = sim.cars[car]
+            if to == lift.cur_floor and not lift.moving:
+                self.send(writer, {"op": "error", "id": message.get("id"),
+                                   "message": "lift %d is already at floor %d" % (car, to)})
+                return
+            # a lift on its way to the floor stops there anyway
+            if to != lift.stop_floor:
+                lift.car_call(to, ID, sim.now)
+                sim.wake(lift)
+        if car is None:
+            self.send(writer, {"op": "error", "id": message.get("id"), "message": "call not given to a lift"})
+        else:
+            self.send(writer, {"op": "assigned", "id": message.get("id"), "car": car, "time": sim.now})
+        self.latency.add((time.perf_counter() - start) * 1e6)
+        self.calls += 1
+
+    def assigned(self, sizes, ID):
+
+        """Index of the lift given the customer ID by a call, found in the customers added to the lifts since
+            they had sizes customers. The dispatcher gives every call to a lift straight away and no event is
+            handled during a call, so the tables of the lifts are not reclaimed in between."""
+
+        for i, car in enumerate(self.sim.cars):
+            customers = car.allcustomer
+            for handle in range(sizes[i], len(customers)):
+                if customers.ID[handle] == ID:
+                    return i
+        return None
+
+    def stop(self, car, floor, eta):
+
+        """Pushes the stop command of a lift to the subscribers."""
+
+        if not self.subscribers:
+            return
+        line = json.dumps({"op": "stop", "car": self.sim.cars.index(car), "floor": floor, "eta": eta}).encode() + b"\n"
+        for writer in list(self.subscribers):
+            if writer.is_closing():
+                self.subscribers.discard(writer)
+            elif writer.transport.get_write_buffer_size() > WRITE_LIMIT:
+                self.dropped += 1
+            else:
+                writer.write(line)
+
+    def send(self, writer, message):
+        if not writer.is_closing():
+            writer.write(json.dumps(message).encode() + b"\n")
+
+    def stats(self):
+        latency = self.latency
+        return {"op": "stats", "calls": self.calls, "time": self.sim.now, "lag": self.clock() - self.sim.now,
+                "decision_us": {"mean": latency.mean, "p50": latency.percentile(50), "p99": latency.percentile(99),
+                                "max": latency.max if latency.count else None},
+                "dropped": self.dropped,
+                "waiting": sum(len(calls) for calls in self.sim.dispatcher.pending.values())}
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.send(writer, {"op": "error", "id": None, "message": "not JSON"})
+                    continue
+                self.handle(message, writer)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+
+def _integer(value):
+
+    """value if it is an integer: JSON numbers with a fraction and booleans are refused."""
+
+    if type(value) is not int:
+        raise TypeError("%s is not an integer" % json.dumps(value))
+    return value
+
+
+async def serve(controller, host="127.0.0.1", port=8765, unix=None):
+
+    """Runs the controller and accepts clients on a TCP port (or a Unix socket if unix is a path) forever."""
+
+    if unix:
+        server = await asyncio.start_unix_server(controller.serve_client, unix)
+    else:
+        server = await asyncio.start_server(controller.serve_client, host, port)
+    print("controller listening on %s" % (unix or "%s:%d" % (host, port)), flush=True)
+    async with server:
+        await asyncio.gather(server.serve_forever(), controller.run())
+
+
+async def connect(host="127.0.0.1", port=8765, unix=None):
+    if unix:
+        return await asyncio.open_unix_connection(unix)
+    return await asyncio.open_connection(host, port)
+
+
+async def replay_calls(reader, writer, arrivals, timeout=2.0):
+
+    """Sends the calls of arrivals (an iterable of (time, cur_floor, dst_floor, ...) sorted by time, in seconds
+        from now) when their time comes, and measures the time from every call to its assignment.
+        Returns (sent, answered, elapsed seconds, latency histogram in milliseconds)."""
+
+    loop = asyncio.get_running_loop()
+    sent = {}
+    latency = Histogram()
+    done = asyncio.Event()
+    finished_sending = False
+
+    async def receive():
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if message.get("op") in ("assigned", "error"):
+                start = sent.pop(message.get("id"), None)
+                if start is not None:
+                    latency.add((time.perf_counter() - start) * 1e3)
+                if finished_sending and not sent:
+                    done.set()
+
+    receiver = asyncio.ensure_future(receive())
+    start = loop.time()
+    count = 0
+    for arrival in arrivals:
+        delay = arrival[0] - (loop.time() - start)
+        if delay > 0 or count % 16 == 0:
+            # lets the answers in while waiting for the next call
+            await writer.drain()
+            await asyncio.sleep(max(delay, 0))
+        sent[count] = time.perf_counter()
+        writer.write(json.dumps({"op": "hall", "id": count, "floor": arrival[1], "to": arrival[2]}).encode() + b"\n")
+        count += 1
+    await writer.drain()
+    elapsed = loop.time() - start
+    finished_sending = True
+    if sent:
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    receiver.cancel()
+    try:
+        await receiver
+    except asyncio.CancelledError:
+        pass
+    return count, count - len(sent), elapsed, latency
+
+
+async def load_test(rates, duration, floors, host="127.0.0.1", port=8765, unix=None, max_p99=50.0, seed=None):
+
+    """Sends Poisson calls at every rate in turn (duration seconds each, a new connection for every rate) and
+        prints the latency of the assignments. A rate is sustained if every call was answered, the calls went out
+        at the rate asked and the p99 latency is below max_p99 milliseconds. Returns the highest sustained rate."""
+
+    rng = random.Random(seed)
+    best = None
+    print("%10s %10s %10s %10s %10s %10s %10s" % ("rate", "sent", "answered", "sent/s", "p50 ms", "p99 ms", "max ms"))
+    for rate in rates:
+        reader, writer = await connect(host, port, unix)
+        arrivals = list(poisson_arrivals(rate, uniform(floors), 0.0, duration, rng=rng))
+        arrivals = [arrival for arrival in arrivals if arrival[1] != arrival[2]]
+        sent, answered, elapsed, latency = await replay_calls(reader, writer, arrivals)
+        writer.close()
+        achieved = sent / elapsed if elapsed else 0.0
+        p99 = latency.percentile(99) or 0.0
+        print("%10d %10d %10d %10.0f %10.2f %10.2f %10.2f" % (rate, sent, answered, achieved,
+                                                              latency.percentile(50) or 0.0, p99, latency.max))
+        if answered < sent or achieved < 0.95 * len(arrivals) / duration or p99 > max_p99:
+            break
+        best = rate
+    return best
+
+
+async def replay_scenario(path, speedup, host="127.0.0.1", port=8765, unix=None):
+
+    """Replays the calls of a scenario file speedup times faster than recorded and prints the latency."""
+
+    from record import replay
+
+    def arrivals():
+        first = None
+        for arrival in replay(path):
+            if first is None:
+                first = arrival[0]
+            yield (arrival[0] - first) / speedup, arrival[1], arrival[2]
+
+    reader, writer = await connect(host, port, unix)
+    sent, answered, elapsed, latency = await replay_calls(reader, writer, arrivals())
+    writer.write(b'{"op": "stats"}\n')
+    stats = json.loads(await reader.readline())
+    writer.close()
+    print("%d calls sent in %.1f s (%.0f/s), %d answered, p50 %.2f ms, p99 %.2f ms, max %.2f ms" % (
+        sent, elapsed, sent / elapsed if elapsed else 0.0, answered, latency.percentile(50) or 0.0,
+        latency.percentile(99) or 0.0, latency.max))
+    print("controller: decision p99 %.1f us, lag %.3f s" % (stats["decision_us"]["p99"] or 0.0, stats["lag"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live lift controller on a local socket, and its load generator.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="path of a Unix socket to use instead of TCP")
+    commands = parser.add_subparsers(dest="command", required=True)
+    server = commands.add_parser("serve", help="run the controller")
+    server.add_argument("--floors", type=int, default=20)
+    server.add_argument("--cars", type=int, default=4)
+    server.add_argument("--algorithm", default="MyCar", choices=list(CARS))
+    server.add_argument("--dispatcher", default="eta", choices=list(DISPATCHERS))
+    server.add_argument("--load", type=int, default=10)
+    server.add_argument("--speed", type=float, default=1.0, help="seconds of simulation per second")
+    load = commands.add_parser("load", help="send calls to a running controller and measure the latency")
+    load.add_argument("--floors", type=int, default=20)
+    load.add_argument("--rates", type=int, nargs="+", default=list(RATES), help="calls per second to try, in order")
+    load.add_argument("--duration", type=float, default=5.0, help="seconds at every rate")
+    load.add_argument("--max-p99", type=float, default=50.0, help="p99 latency (ms) above which a rate is not sustained")
+    load.add_argument("--scenario", default=None, help="replay this scenario file instead")
+    load.add_argument("--speedup", type=float, default=60.0, help="how much faster than recorded the scenario goes")
+    load.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        controller = Controller(args.floors, args.cars, args.algorithm, args.dispatcher, args.speed, load=args.load)
+        try:
+            asyncio.run(serve(controller, args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+    elif args.scenario:
+        asyncio.run(replay_scenario(args.scenario, args.speedup, args.host, args.port, args.unix))
+    else:
+        best = asyncio.run(load_test(args.rates, args.duration, args.floors, args.host, args.port, args.unix,
+                                     args.max_p99, args.seed))
+        print("highest sustained rate: %s calls/s" % (best if best is not None else "none"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,583 @@
+"""Headless simulation engine for the lifts.
+
+The engine owns the whole state of the simulation: the customers, the lifts and the clock.
+Instead of moving the lifts one pixel per frame, it moves time forward from one event to the next
+(a lift arrives at a floor, customers get out, customers get in), so a full run takes milliseconds.
+The pygame front end in main.py is only a viewer: it asks the engine where the lifts are and draws them.
+"""
+
+import heapq
+import random
+from collections import deque
+
+import strategies
+from calls import CallIndex
+from motion import Linear
+from passengers import DOWN, IDLE, UP, PassengerTable
+from strategies import STRATEGIES, Look, Scan
+
+# kinds of events handled by the simulation
+ARRIVE = 0
+ALIGHT = 1
+BOARD = 2
+CLOSE = 3
+DEPART = 4
+CALL = 5
+
+# states of the lifts: arriving at a floor the doors open, stay open while people get out and in,
+# close, and then the lift leaves
+CLOSED = 0
+OPENING = 1
+OPEN = 2
+CLOSING = 3
+MOVING = 4
+
+# smallest number of delivered customers dropped at once by Simulation(reclaim=True)
+RECLAIM_MIN = 1024
+
+
+class Customer:
+    """This class manages all the information about the customers using the lift:
+        ID, direction, their current floor and the floor they want to go to.
+        The engine stores customers in a PassengerTable; this class is a convenient way to create them."""
+
+    def __init__(self, floor, cur_floor=None, dst_floor=None, rng=random):
+
+        """Initialisation of the class. The floors are picked at random unless they are given.
+            rng is the random generator to use (a seeded random.Random makes the customers reproducible)."""
+
+        self.ID = rng.randrange(1, 100, 1)
+        self.finished = False
+        self.num_of_floors = floor
+        if cur_floor is None:
+            cur_floor = rng.randrange(0, self.num_of_floors, 1)
+        if dst_floor is None:
+            dst_floor = rng.randrange(0, self.num_of_floors, 1)
+        self.cur_floor = cur_floor
+        self.dst_floor = dst_floor
+        self.direction = IDLE
+        self.update()
+
+    def update(self):
+
+        """This function decides the direction of the customers"""
+
+        # finds direction by comparing current floor with destination floor
+        if self.dst_floor == self.cur_floor:
+            self.finished = True
+            self.direction = IDLE
+        elif self.cur_floor < self.dst_floor:
+            self.direction = UP
+            self.finished = False
+        else:
+            self.direction = DOWN
+            self.finished = False
+
+        return
+
+
+class Car:
+    """Headless lift. Keeps the customers waiting for it and the customers inside it,
+        and decides where to stop next. It has no notion of pixels or frames."""
+
+    # decides where the lift stops next (see strategies.py), set by the subclasses
+    strategy = Look()
+
+    def __init__(self, floor_num, load=10):
+
+        """Initialisation of the class. The lift starts at the ground floor going up."""
+
+        self.num_of_floors = floor_num
+        # floor to start from
+        self.cur_floor = 0
+        # direction to start from -> start from groundfloor so can only go up (1 is up, 0 is down, -1 is stay)
+        self.direction = UP
+        # to keep track of the number of floors stop at
+        self.floor_count = 0
+        # number of floors travelled
+        self.cost = 0
+
+        self.state = CLOSED
+        self.overload = False
+        self.load = load
+
+        # every customer is a handle (an index) in allcustomer
+        self.allcustomer = PassengerTable()
+        self.elevator_customer = []
+        # customers who got out at the last stop, and in total
+        self.delivered = 0
+        self.finished_customer = 0
+        # customers who had got out the last time allcustomer was compacted (see reclaim)
+        self.reclaimed = 0
+        # customers waiting on every floor, one queue per direction: floor_list[floor][direction]
+        self.floor_list = [[deque(), deque()] for _ in range(self.num_of_floors)]
+        # floors with customers waiting to go up or down and floors where customers inside want to get out
+        self.calls = CallIndex(self.num_of_floors)
+
+        # latency statistics (metrics.LatencyStats) recorded when customers get in and out, if any
+        self.metrics = None
+        # how the lift moves between floors (motion.Linear or motion.Kinematic), set by the simulation
+        self.motion = None
+
+        self.next_floor = None
+        # floor and time the lift left from, used to know where it is while moving
+        self.dep_floor = 0
+        self.dep_time = 0.0
+        self.arr_time = 0.0
+
+    def add_customer(self, customer_list):
+
+        """Adds customers (a PassengerTable or a list of Customer) to the allcustomer table and to the queue
+            of their floor. The customers are copied so that two lifts never change each other's customers."""
+
+        for handle in self.allcustomer.extend(customer_list):
+            self.enqueue(handle)
+
+    def call(self, cur_floor, dst_floor, ID=None, arrival_time=0.0):
+
+        """Adds a single customer (a hall call given to this lift). Returns its handle."""
+
+        handle = self.allcustomer.add(cur_floor, dst_floor, ID, arrival_time)
+        self.enqueue(handle)
+        return handle
+
+    def car_call(self, dst_floor, ID=None, now=0.0):
+
+        """A customer inside the lift presses the button of dst_floor: they are added as if they had got in
+            at the time now at stop_floor, the first floor where they can get out. Returns their handle;
+            the customer is already finished if dst_floor is that floor."""
+
+        customers = self.allcustomer
+        handle = customers.add(self.stop_floor, dst_floor, ID, now)
+        customers.board_time[handle] = now
+        if not customers.finished[handle]:
+            self.elevator_customer.append(handle)
+            self.calls.car.add(dst_floor)
+            self.overload = len(self.elevator_customer) >= self.load
+        return handle
+
+    def enqueue(self, handle):
+
+        """Puts a customer of allcustomer in the queue of its floor."""
+
+        customers = self.allcustomer
+        if not customers.finished[handle]:
+            self.floor_list[customers.cur_floor[handle]][customers.direction[handle]].append(handle)
+            self.calls.hall[customers.direction[handle]].add(customers.cur_floor[handle])
+
+    def floor_initialize(self):
+
+        """This function rebuilds the queues of the floors and the call indexes from allcustomer.
+            The queues are kept up to date as customers come, get in and get out, so this is only
+            needed if the customers were changed from outside."""
+
+        customers = self.allcustomer
+        self.floor_list = [[deque(), deque()] for _ in range(self.num_of_floors)]
+        self.calls.clear()
+        inside = set(self.elevator_customer)
+        for handle in range(len(customers)):
+            if handle in inside:
+                self.calls.car.add(customers.dst_floor[handle])
+            elif not customers.finished[handle]:
+                self.floor_list[customers.cur_floor[handle]][customers.direction[handle]].append(handle)
+                self.calls.hall[customers.direction[handle]].add(customers.cur_floor[handle])
+
+        return
+
+    def reclaim(self):
+
+        """Drops the customers who have got out (and those who never needed the lift) from allcustomer, once their
+            times have gone to the metrics and the trace, so the memory of a long run does not grow with the
+            number of customers. The customers still waiting or inside get new handles."""
+
+        finished = self.allcustomer.finished
+        kept = [handle for handle in range(len(finished)) if not finished[handle]]
+        handles = {handle: i for i, handle in enumerate(kept)}
+        self.allcustomer.keep(kept)
+        for queues in self.floor_list:
+            for direction, queue in enumerate(queues):
+                if queue:
+                    queues[direction] = deque(handles[handle] for handle in queue)
+        self.elevator_customer = [handles[handle] for handle in self.elevator_customer]
+        self.reclaimed = self.finished_customer
+
+    def cancel_customer(self, now=0.0):
+
+        """This function removes customers from the lift when they have reached their desired floor.
+            Returns the customers that got out."""
+
+        if self.cur_floor not in self.calls.car:
+            return []
+        customers = self.allcustomer
+        dst_floor = customers.dst_floor
+        out = [handle for handle in self.elevator_customer if dst_floor[handle] == self.cur_floor]
+        for handle in out:
+            if self.metrics is not None:
+                self.metrics.alight(customers.cur_floor[handle], now - customers.board_time[handle],
+                                    now - customers.arrival_time[handle])
+            customers.arrive(handle, self.cur_floor, now)
+        self.delivered = len(out)
+        self.elevator_customer = [handle for handle in self.elevator_customer if dst_floor[handle] != self.cur_floor]
+        self.calls.car.remove(self.cur_floor, len(out))
+        self.finished_customer += len(out)
+        self.overload = len(self.elevator_customer) >= self.load
+        return out
+
+    def register_customer(self, now=0.0):
+
+        """Adds the customers waiting at the current floor and going in the direction of the lift
+            to the elevator_customer list, as long as the lift is not full. Returns the customers that got in."""
+
+        if self.direction == IDLE:
+            return []
+        waiting = self.floor_list[self.cur_floor][self.direction]
+        dst_floor = self.allcustomer.dst_floor
+        board_time = self.allcustomer.board_time
+        taken = []
+        # check if lift is not full
+        while len(waiting) and len(self.elevator_customer) < self.load:
+            handle = waiting.popleft()
+            board_time[handle] = now
+            if self.metrics is not None:
+                self.metrics.board(self.cur_floor, now - self.allcustomer.arrival_time[handle])
+            self.elevator_customer.append(handle)
+            self.calls.car.add(dst_floor[handle])
+            taken.append(handle)
+        if len(taken):
+            self.calls.hall[self.direction].remove(self.cur_floor, len(taken))
+        self.overload = len(self.elevator_customer) >= self.load
+        return taken
+
+    def next_stop(self):
+
+        """This function decides the next floor the lift will stop at. It returns None when there is nothing
+            left to do. The decision is made by the strategy of the lift (see strategies.py)."""
+
+        return self.strategy.next_stop(self)
+
+    def estimate(self, floor, direction, now, floor_time=1.0, stop_time=4.0, queued=True):
+
+        """Estimates how long (in seconds from now) the lift would need to pick up a customer waiting at floor
+            to go in direction, following the same rules as next_stop: the lift keeps its direction until it
+            turns around where its strategy says (see Strategy.turn). stop_time is the time
+            lost at every stop on the way. The time the customers already given to the lift add (see
+            queue_time) is counted unless queued is False."""
+
+        # a moving lift always stops at next_floor first
+        start = self.next_floor if self.moving else self.cur_floor
+        delay = max(self.arr_time - now, 0.0) if self.moving else 0.0
+        mask = self.calls.mask()
+        low = (mask & -mask).bit_length() - 1 if mask else start
+        high = mask.bit_length() - 1 if mask else start
+
+        if self.direction == IDLE:
+            travel = abs(floor - start)
+            stops = 0
+        elif direction == self.direction and (floor - start) * (1 if self.direction == UP else -1) >= 0:
+            # on the way
+            travel = abs(floor - start)
+            stops = _count(mask, min(start, floor), max(start, floor))
+        else:
+            turn, back = self.strategy.turn(self, start, floor, low, high)
+            if direction != self.direction:
+                travel = abs(turn - start) + abs(turn - floor)
+            else:
+                travel = abs(turn - start) + abs(turn - back) + abs(back - floor)
+            stops = bin(mask).count("1")
+
+        return delay + travel * floor_time + stops * stop_time + (self.queue_time(floor_time) if queued else 0.0)
+
+    def queue_time(self, floor_time=1.0):
+
+        """Time the customers already given to the lift (inside it or waiting for it) add to the estimate of a
+            new one: every load of them is one more trip across the building before the lift has room.
+            A full lift has to drop everyone first."""
+
+        queued = len(self.elevator_customer) + self.calls.hall[UP].total + self.calls.hall[DOWN].total
+        return queued // self.load * (self.num_of_floors - 1) * floor_time
+
+    def position(self, now):
+
+        """Returns the position of the lift at the time now, as a (fractional) floor number."""
+
+        if not self.moving or self.arr_time <= self.dep_time:
+            return float(self.cur_floor)
+        floors = abs(self.next_floor - self.dep_floor)
+        if self.motion is None:
+            done = min(max((now - self.dep_time) / (self.arr_time - self.dep_time), 0.0), 1.0) * floors
+        else:
+            done = self.motion.distance(floors, now - self.dep_time)
+        return self.dep_floor + (done if self.next_floor > self.dep_floor else -done)
+
+    @property
+    def moving(self):
+        return self.state == MOVING
+
+    @property
+    def stop_floor(self):
+
+        """Floor where the lift stops next: the floor it is moving to, or the floor it is at."""
+
+        return self.next_floor if self.moving else self.cur_floor
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+
+class MechaCar(Car):
+    """The mechanical lift: never changes direction until it has reached the bottom or the top."""
+
+    strategy = Scan()
+
+
+class MyCar(Car):
+    """My lift: never changes direction until it has finished all the tasks in the same direction."""
+
+    strategy = Look()
+
+
+def _count(mask, low, high):
+
+    """Number of floors between low and high (included) set in mask."""
+
+    return bin((mask >> low) & ((1 << (high - low + 1)) - 1)).count("1")
+
+
+def strategy_car(strategy_class):
+
+    """Lift class driven by a registered strategy, named after it."""
+
+    return type(strategy_class.name, (Car,), {"strategy": strategy_class(), "__doc__": strategy_class.__doc__})
+
+
+# lift algorithms by name, used to pick them from the command line or in sweeps: the two lifts above and a lift
+# for every other registered strategy. This is strategies.CARS: strategies registered later are added to it.
+CARS = strategies.CARS
+CARS.update((car_class.__name__, car_class) for car_class in (MechaCar, MyCar))
+strategies.car_class = strategy_car
+for strategy_class in STRATEGIES.values():
+    strategies.add_car(strategy_class)
+
+
+class Simulation:
+    """Discrete event simulation of one or more lifts. Events are kept in a heap ordered by time,
+        and the clock jumps from one event to the next."""
+
+    def __init__(self, floor, customers=(), cars=(MechaCar, MyCar), floor_time=1.0, load=10,
+                 door_time=1.0, dwell_time=2.0, arrivals=None, metrics=None, motion=None, trace=None,
+                 reclaim=False):
+
+        """Initialisation of the class. customers is a PassengerTable or a list of Customer,
+            every lift gets its own copy of them. floor_time is the time (in seconds) a lift needs to go from one floor to the next one,
+            door_time the time the doors need to open or to close and dwell_time the time they stay open.
+            arrivals is an optional iterator of (time, cur_floor, dst_floor) sorted by time (see traffic.py):
+            those customers are read one at a time, when the clock reaches them.
+            metrics is an optional metrics.Metrics collecting the wait and ride times of every algorithm.
+            motion is how the lifts move between floors (see motion.py); by default floor_time per floor.
+            With a motion.Kinematic, floor_time is the time per floor at full speed.
+            trace is an optional record.RecordWriter getting every stop, boarding and alighting.
+            With reclaim, the lifts forget the customers they have delivered (see Car.reclaim): memory stays
+            bounded however many customers arrive, but their times are only kept in the metrics and the trace."""
+
+        self.num_of_floors = floor
+        self.motion = motion if motion is not None else Linear(floor_time)
+        self.floor_time = self.motion.floor_time
+        self.door_time = door_time
+        self.dwell_time = dwell_time
+        self.trace = trace
+        self.reclaim = reclaim
+        self.now = 0.0
+        self.events = []
+        self._seq = 0  # keeps the order of events happening at the same time
+        self.handled = 0  # events handled so far
+        self.cars = []
+        customers = PassengerTable.from_customers(customers)
+        for car_class in cars:
+            car = car_class(floor, load)
+            car.motion = self.motion
+            if metrics is not None:
+                car.metrics = metrics.get(car.name)
+            car.add_customer(customers)
+            self.cars.append(car)
+            # the lift starts with its doors open at the ground floor
+            car.state = OPEN
+            self.schedule(0.0, BOARD, car)
+
+        self.arrivals = iter(arrivals) if arrivals is not None else None
+        # customers read from arrivals so far, to read them again from the same point (see snapshot.py)
+        self.arrival_count = 0
+        self.next_arrival()
+
+    def next_arrival(self):
+
+        """Reads the next customer from arrivals (a tuple (time, cur_floor, dst_floor) or (time, cur_floor, dst_floor, ID)) and schedules the moment they call the lift."""
+
+        if self.arrivals is None:
+            return
+        arrival = next(self.arrivals, None)
+        if arrival is None:
+            self.arrivals = None
+            return
+        self._arrival = arrival
+        self.arrival_count += 1
+        self.schedule(arrival[0], CALL, None)
+
+    def call(self, cur_floor, dst_floor, ID=None):
+
+        """A customer arrives now. Every lift gets a copy of the call."""
+
+        for car in self.cars:
+            car.call(cur_floor, dst_floor, ID, self.now)
+            self.wake(car)
+
+    def schedule(self, time, kind, car):
+
+        """Adds an event to the queue."""
+
+        heapq.heappush(self.events, (time, self._seq, kind, car))
+        self._seq += 1
+
+    def wake(self, car):
+
+        """Gets a waiting lift going again after it has been given new calls. A lift with its doors open lets
+            the new customers at its floor in straight away."""
+
+        if car.direction == IDLE and car.state == CLOSED:
+            self.schedule(self.now, DEPART, car)
+        elif car.state == OPEN:
+            self.let_in(car)
+
+    @property
+    def stop_time(self):
+
+        """Time lost when a lift stops at a floor: opening, dwell and closing."""
+
+        return 2 * self.door_time + self.dwell_time
+
+    def step(self):
+
+        """Handles the next event. Returns False when there is nothing left to do."""
+
+        if not self.events:
+            return False
+        time, _, kind, car = heapq.heappop(self.events)
+        self.now = time
+        self.handled += 1
+
+        if kind == ARRIVE:
+            self.arrive(car)
+        elif kind == ALIGHT:
+            car.state = OPEN
+            out = car.cancel_customer(self.now)
+            if self.trace is not None:
+                self.record(ALIGHT, car, out)
+            # compacting once half of the table is delivered costs a constant time per customer
+            if self.reclaim and car.finished_customer - car.reclaimed >= max(len(car.allcustomer) // 2, RECLAIM_MIN):
+                car.reclaim()
+            self.schedule(self.now, BOARD, car)
+        elif kind == BOARD:
+            self.board(car)
+        elif kind == CLOSE:
+            car.state = CLOSING
+            self.schedule(self.now + self.door_time, DEPART, car)
+        elif kind == DEPART:
+            self.depart(car)
+        elif kind == CALL:
+            self.call(*self._arrival[1:])
+            self.next_arrival()
+        return True
+
+    def arrive(self, car):
+
+        """The lift reaches the floor it was going to and starts opening its doors."""
+
+        car.state = OPENING
+        # increase the floor count by one and add the floors travelled since the last stop to the cost
+        car.floor_count += 1
+        car.cost += abs(car.next_floor - car.cur_floor)
+        car.cur_floor = car.next_floor
+        if self.trace is not None:
+            self.trace.write(self.now, ARRIVE, car.cur_floor, car=self.cars.index(car))
+        self.schedule(self.now + self.door_time, ALIGHT, car)
+
+    def board(self, car):
+
+        """Lets people in while the doors are open, then starts closing them after dwell_time."""
+
+        self.let_in(car)
+        self.schedule(self.now + self.dwell_time, CLOSE, car)
+
+    def let_in(self, car):
+
+        """Lets in the customers waiting at the floor of the lift to go its way, as long as there is room."""
+
+        car.next_floor = car.next_stop()
+        while car.next_floor == car.cur_floor:
+            taken = car.register_customer(self.now)
+            if not taken:
+                break
+            if self.trace is not None:
+                self.record(BOARD, car, taken)
+            car.next_floor = car.next_stop()
+
+    def record(self, kind, car, handles):
+
+        """Writes the customers who got in (BOARD) or out (ALIGHT) of the lift to the trace."""
+
+        customers = car.allcustomer
+        index = self.cars.index(car)
+        for handle in handles:
+            self.trace.write(self.now, kind, car.cur_floor, customers.dst_floor[handle], customers.ID[handle], index)
+
+    def depart(self, car):
+
+        """The doors are closed: sends the lift to its next stop, opens the doors again if someone
+            is waiting at this floor, or leaves the lift waiting when there is nothing to do."""
+
+        if car.state not in (CLOSING, CLOSED):
+            return  # the lift was woken up twice and is already on its way
+        car.state = CLOSED
+        car.next_floor = car.next_stop()
+        if car.next_floor is None:
+            car.direction = IDLE
+            return
+        if car.next_floor == car.cur_floor:
+            car.state = OPENING
+            self.schedule(self.now + self.door_time, ALIGHT, car)
+            return
+
+        car.state = MOVING
+        car.dep_floor = car.cur_floor
+        car.dep_time = self.now
+        car.arr_time = self.now + self.motion.travel_time(abs(car.next_floor - car.cur_floor))
+        self.schedule(car.arr_time, ARRIVE, car)
+
+    def run(self, until=None):
+
+        """Handles events until there are none left, or until the clock reaches until."""
+
+        while self.events and (until is None or self.events[0][0] <= until):
+            self.step()
+        if until is not None and until > self.now:
+            self.now = until
+        return self
+
+    @property
+    def done(self):
+        return not self.events
+
+
+def main():
+    from metrics import Metrics
+
+    customers = [Customer(20) for _ in range(0, 10)]
+    metrics = Metrics()
+    sim = Simulation(20, customers, metrics=metrics).run()
+    for car in sim.cars:
+        print(car.name, "cost:", car.cost, "stops:", car.floor_count, "finished:", car.finished_customer)
+    metrics.print_report()
+
+
+if __name__ == "__main__":
+    main()
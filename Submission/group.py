@@ -0,0 +1,241 @@
+"""Group control of several lifts sharing the same hall calls.
+
+In the comparison mode of engine.Simulation every lift serves every customer on its own copy of them.
+Here the lifts share one pool of hall calls: a dispatcher gives every call to exactly one lift, the one
+with the lowest estimated time to serve it (Car.estimate, built on the rules of next_stop, and the customers
+already given to the lift). Every lift only keeps the customers it was given, so lifts never touch each other's
+customers. Other dispatchers can be picked in DISPATCHERS: nearest car, and destination dispatch preferring the
+lifts that already stop where the customers go.
+
+    python group.py --cars 32 --floors 100 --passengers 10000 --dispatcher destination
+"""
+
+import argparse
+import heapq
+import time
+
+from engine import CARS, IDLE, UP, MyCar, Simulation
+from motion import Kinematic
+from passengers import PassengerTable
+
+
+class Dispatcher:
+    """Gives the pending hall calls to the lifts. Customers waiting at the same floor to go in the same
+        direction press the same button, so they are given to the same lift."""
+
+    def __init__(self, sim):
+
+        """Initialisation of the class. sim is the GroupSimulation whose lifts get the calls."""
+
+        self.sim = sim
+        # customers not given to a lift yet, by button (floor, direction)
+        self.pending = {}
+        # lift serving every button
+        self.assigned = {}
+
+    def call(self, cur_floor, dst_floor, ID=None, arrival_time=0.0):
+
+        """A customer arrives and presses a button. The call is given to a lift at the next dispatch,
+            unless a lift is already coming for that button and has room for one more."""
+
+        if cur_floor == dst_floor:
+            return
+        button = self.button(cur_floor, dst_floor)
+        car = self.assigned.get(button)
+        if car is not None and 0 < len(car.floor_list[cur_floor][button[1]]) < car.load:
+            car.call(cur_floor, dst_floor, ID, arrival_time)
+            self.sim.wake(car)
+            return
+        self.pending.setdefault(button, []).append((cur_floor, dst_floor, ID, arrival_time))
+
+    def button(self, cur_floor, dst_floor):
+
+        """Customers with the same button are given to the same lift: (floor, direction) for hall buttons."""
+
+        return cur_floor, 1 if dst_floor > cur_floor else 0
+
+    def dispatch(self):
+
+        """Gives every pending button to a lift, the cheapest first. The cost of a lift is its cost for the
+            button (cost) plus the cost of the customers already given to it (queue_cost), which is the same for
+            every button. Every lift keeps the costs of the buttons in a heap, so only the tops of the heaps are
+            compared. Giving calls to a lift only makes its costs grow, so those of its heap stay lower bounds:
+            they are recomputed lazily when they reach the top of the heap, and only if the calls changed a
+            floor where the lift stops (see stale)."""
+
+        if not self.pending:
+            return
+        sim = self.sim
+        cars = sim.cars
+        version = [0] * len(cars)
+        heaps = []
+        for car in cars:
+            heap = [(self.cost(car, button), button, 0) for button in self.pending]
+            heapq.heapify(heap)
+            heaps.append(heap)
+        queues = [self.queue_cost(car) for car in cars]
+
+        while self.pending:
+            best = None
+            for i, heap in enumerate(heaps):
+                while heap:
+                    cost, button, seen = heap[0]
+                    if button not in self.pending:
+                        heapq.heappop(heap)
+                    elif seen != version[i]:
+                        heapq.heapreplace(heap, (self.cost(cars[i], button), button, version[i]))
+                    else:
+                        if best is None or (cost + queues[i], button, i) < best:
+                            best = cost + queues[i], button, i
+                        break
+            if best is None:
+                break
+            _, button, i = best
+            car = cars[i]
+            mask = car.calls.mask()
+            self.give(car, button)
+            if self.stale(car, mask):
+                version[i] += 1
+            queues[i] = self.queue_cost(car)
+            sim.wake(car)
+
+    def give(self, car, button):
+
+        """Gives the customers of a pending button to a lift."""
+
+        for customer in self.pending.pop(button):
+            car.call(*customer)
+        self.assigned[button] = car
+
+    def stale(self, car, mask):
+
+        """Tells if the costs of a lift for the buttons changed when it was given calls (mask is the bitset of
+            its calls before). The cost of a waiting lift is its distance, which calls do not change."""
+
+        return car.direction != IDLE and car.calls.mask() != mask
+
+    def cost(self, car, button):
+        sim = self.sim
+        return car.estimate(button[0], button[1], sim.now, sim.floor_time, sim.stop_time, queued=False)
+
+    def queue_cost(self, car):
+        return car.queue_time(self.sim.floor_time)
+
+
+class NearestCarDispatcher(Dispatcher):
+    """Nearest car: every call goes to the closest lift, a lift already going towards the call in the same
+        direction being preferred. Cheaper than estimating the time, but blind to the stops on the way."""
+
+    def cost(self, car, button):
+        floor, direction = button[0], button[1]
+        position = car.position(self.sim.now)
+        if car.direction == IDLE:
+            return abs(floor - position)
+        coming = (floor - position) * (1 if car.direction == UP else -1) >= 0
+        if coming and direction == car.direction:
+            return abs(floor - position)
+        # the lift has to turn around first
+        return abs(floor - position) + car.num_of_floors
+
+    def queue_cost(self, car):
+        # in floors, like the distances
+        return car.queue_time()
+
+    def stale(self, car, mask):
+        return False
+
+
+class DestinationDispatcher(Dispatcher):
+    """Destination dispatch: customers give their destination at the hall. The customers waiting at a floor to
+        go in the same direction go to the same lift, where they get in grouped by destination, and every
+        destination where the lift does not stop already costs one more stop."""
+
+    def cost(self, car, button):
+        cost = super().cost(car, button)
+        calls = car.calls
+        for destination in {customer[1] for customer in self.pending[button]}:
+            if destination not in calls.car and destination not in calls.hall[button[1]]:
+                cost += self.sim.stop_time
+        return cost
+
+    def give(self, car, button):
+        self.pending[button].sort(key=lambda customer: customer[1])
+        super().give(car, button)
+
+    def stale(self, car, mask):
+        # new stops can make the destinations of a button cheaper, even for a waiting lift
+        return car.calls.mask() != mask
+
+
+# dispatchers by name, used to pick them from the command line
+DISPATCHERS = {"eta": Dispatcher, "nearest": NearestCarDispatcher, "destination": DestinationDispatcher}
+
+
+class GroupSimulation(Simulation):
+    """Simulation of a group of lifts sharing one pool of hall calls through a Dispatcher."""
+
+    def __init__(self, floor, customers=(), cars=(MyCar,) * 4, dispatcher=Dispatcher, **options):
+
+        """Initialisation of the class. cars is the list of lift classes of the group, customers
+            (a PassengerTable or a list of Customer) are given to the lifts by the dispatcher
+            (a Dispatcher class, see DISPATCHERS)."""
+
+        super().__init__(floor, (), cars, **options)
+        self.dispatcher = dispatcher(self)
+        customers = PassengerTable.from_customers(customers)
+        for handle in range(len(customers)):
+            self.dispatcher.call(customers.cur_floor[handle], customers.dst_floor[handle],
+                                 customers.ID[handle], customers.arrival_time[handle])
+        self.dispatcher.dispatch()
+
+    def call(self, cur_floor, dst_floor, ID=None):
+
+        """A customer arrives now: the call is dispatched straight away."""
+
+        self.dispatcher.call(cur_floor, dst_floor, ID, self.now)
+        self.dispatcher.dispatch()
+
+    @property
+    def finished_customer(self):
+        return sum(car.finished_customer for car in self.cars)
+
+    @property
+    def cost(self):
+        return sum(car.cost for car in self.cars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a group of lifts sharing the hall calls.")
+    parser.add_argument("--cars", type=int, default=4)
+    parser.add_argument("--algorithm", default="MyCar", choices=list(CARS))
+    parser.add_argument("--dispatcher", default="eta", choices=list(DISPATCHERS))
+    parser.add_argument("--floors", type=int, default=20)
+    parser.add_argument("--passengers", type=int, default=100)
+    parser.add_argument("--load", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--speed", type=float, default=None, help="max speed in m/s (constant time per floor if not given)")
+    parser.add_argument("--accel", type=float, default=1.0, help="max acceleration in m/s^2")
+    parser.add_argument("--jerk", type=float, default=1.5, help="max jerk in m/s^3")
+    args = parser.parse_args()
+    motion = Kinematic(max_speed=args.speed, max_accel=args.accel, max_jerk=args.jerk) if args.speed else None
+
+    customers = PassengerTable.random(args.floors, args.passengers, args.seed)
+
+    start = time.perf_counter()
+    sim = GroupSimulation(args.floors, customers, (CARS[args.algorithm],) * args.cars, load=args.load,
+                          dispatcher=DISPATCHERS[args.dispatcher], motion=motion)
+    dispatched = time.perf_counter()
+    sim.run()
+    end = time.perf_counter()
+
+    waits = [car.allcustomer.board_time[h] - car.allcustomer.arrival_time[h]
+             for car in sim.cars for h in range(len(car.allcustomer))]
+    print("dispatch: %.3f s, simulation: %.3f s" % (dispatched - start, end - dispatched))
+    print("finished customers: %d, total cost: %d, simulated time: %.0f s, mean wait: %.1f s" % (
+        sim.finished_customer, sim.cost, sim.now, sum(waits) / max(len(waits), 1)))
+    for i, car in enumerate(sim.cars):
+        print("car %d: %d customers, cost %d, stops %d" % (i, len(car.allcustomer), car.cost, car.floor_count))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,21 +3,116 @@
 The mechanical lift never changes direction until it has reached the bottom or the top.
 My lift never changes direction until has finished all the task in the same direction. But he can change direction when not at the top/bottom.
 I have implemented a simple GUI system. Charts are then loaded to compare the efficiency of both algorithm.
+
+The simulation itself runs in engine.py and does not need pygame. This file is only a viewer:
+it advances the engine clock with the real time and draws where the lifts are.
+A scenario file written by record.py can be given on the command line to replay it.
 """
 
+import argparse
+import math
 import os
-import random
 import sys
+import time
 
 import pygame
-from pygame.sprite import Sprite
+
+from engine import CARS, Customer, Simulation
+from motion import Kinematic
+from profiling import Profiler
+
+# time acceleration factors of the viewer (simulated seconds per real second), None runs the simulation
+# as fast as possible. Press 1, 2, 3 or 4 to pick one.
+SPEEDS = (1, 10, 1000, None)
+# frames drawn per second
+FPS = 60
+# number of backgrounds and scaled lift pictures kept in memory (one per window size and number of floors)
+CACHE_SIZE = 8
+# at most that many floors are shown at once (scroll with the arrows, page up/down or the mouse wheel,
+# zoom with + and -), and floors smaller than MIN_FLOOR_PIXELS are drawn in bands of several floors
+MAX_VISIBLE_FLOORS = 40
+MIN_FLOOR_PIXELS = 4
+# with the unbounded speed, real time (in seconds) given to the simulation every frame so the window stays responsive
+FRAME_BUDGET = 0.6 / FPS
+
+
+def round_number(minimum):
+
+    """Smallest of 1, 2, 5, 10, 20, 50, 100... that is at least minimum."""
+
+    number = 1
+    while number < minimum:
+        number *= 2.5 if str(number).startswith("2") else 2
+    return int(number)
+
+
+class Viewport:
+    """Part of the building shown in the window. Only floors between first and first + visible_floors are drawn;
+        the window can be scrolled and zoomed. When floors are smaller than MIN_FLOOR_PIXELS, they are drawn as bands
+        of several floors, so the drawing cost depends on the size of the window and not on the height of the building."""
+
+    def __init__(self, floor, top, bottom, visible_floors=None):
+
+        """Initialisation of the class. top and bottom are the pixels between which the building is drawn."""
+
+        self.num_of_floors = floor
+        self.top = top
+        self.bottom = bottom
+        self.visible_floors = min(floor, visible_floors or MAX_VISIBLE_FLOORS)
+        self.first = 0.0
+
+    @property
+    def floor_height(self):
+        return (self.bottom - self.top) / self.visible_floors
+
+    @property
+    def band(self):
+
+        """Number of floors drawn as one band (level of detail)."""
+
+        return round_number(MIN_FLOOR_PIXELS / self.floor_height)
+
+    def pixel(self, floor):
+
+        """Pixel of the bottom of the (fractional) floor."""
+
+        return self.bottom - (floor - self.first) * self.floor_height
+
+    def shows(self, floor):
+        return self.first - 1 < floor < self.first + self.visible_floors
+
+    def lines(self):
+
+        """Floors whose bottom line is drawn: the visible ones, one every band floors."""
+
+        band = self.band
+        start = int(self.first) // band * band
+        return range(start, min(int(self.first + self.visible_floors) + 1, self.num_of_floors + 1), band)
+
+    def scroll(self, floors):
+        self.first = min(max(self.first + floors, 0.0), float(self.num_of_floors - self.visible_floors))
+
+    def zoom(self, factor):
+
+        """Shows factor times more floors, keeping the middle of the view where it is."""
+
+        middle = self.first + self.visible_floors / 2
+        self.visible_floors = min(max(int(round(self.visible_floors * factor)), 1), self.num_of_floors)
+        self.first = middle - self.visible_floors / 2
+        self.scroll(0)
+
+    def key(self):
+        return self.first, self.visible_floors
 
 
 class Building(pygame.sprite.Sprite):
     """ This class manages the structure of the building. It defines the shape of the building,
         the height of the floors, the position of building and the number of floors. """
 
-    def __init__(self, floor=20):
+    # backgrounds already drawn, by (screen size, number of floors, part of the building shown)
+    backgrounds = {}
+
+    def __init__(self, floor=20, viewport=None):
 
         """Initialisation of the class. The parameters of the building are defined."""
 
@@ -30,454 +125,273 @@ class Building(pygame.sprite.Sprite):
         self.red = (255, 0, 0)
 
         self.floor_width = self.screen.get_width() * 0.2
-        self.floor_height = (self.screen.get_height() - 20) / self.num_of_floors
-
-        self.hor_margin = self.floor_width * 0.5
-        self.ver_margin = self.floor_height * 0.30
 
         self.leftwall = self.screen.get_width() * 0.375
         self.ground = self.screen.get_height() - 10
 
+        self.viewport = viewport or Viewport(floor, 10, self.ground)
+
         self.load_background()
 
     def load_background(self):
 
-        """This function calls the draw_function and then the screen_shot function.
-            It loads the picture of the building saved."""
-
-        self.screen.fill((255, 255, 255))
-        self.draw_building()
-        self.screen_shot()
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        background = os.path.join(current_dir, "background.bmp")
-        try:
-            self.image = pygame.image.load(background).convert()
-        except pygame.error:
-            print("Background can't be loaded")
+        """This function draws the building on an off-screen surface, once for every screen size, number
+            of floors and part of the building shown: the surfaces are kept in memory and reused,
+            nothing is written to the disk."""
+
+        key = (self.screen.get_size(), self.num_of_floors, self.viewport.key())
+        if key not in Building.backgrounds:
+            if len(Building.backgrounds) >= CACHE_SIZE:
+                Building.backgrounds.pop(next(iter(Building.backgrounds)))
+            self.image = pygame.Surface(self.screen.get_size()).convert()
+            self.image.fill((255, 255, 255))
+            self.draw_building()
+            Building.backgrounds[key] = self.image
+        self.image = Building.backgrounds[key]
         return
 
     def draw_building(self):
 
-        """The function draws the whole building and defines the width of the lines."""
+        """The function draws the visible part of the building on self.image and defines the width of the lines.
+            Floor numbers are written next to the lines in tall buildings."""
 
-        pygame.draw.line(self.screen, self.black, (int(self.leftwall), 10), (int(self.leftwall), int(self.ground)), 3)
-        pygame.draw.line(self.screen, self.black, (int(self.leftwall) + int(self.floor_width), 10),
+        viewport = self.viewport
+        pygame.draw.line(self.image, self.black, (int(self.leftwall), 10), (int(self.leftwall), int(self.ground)), 3)
+        pygame.draw.line(self.image, self.black, (int(self.leftwall) + int(self.floor_width), 10),
                          (int(self.leftwall) + int(self.floor_width), int(self.ground)), 3)
-        pygame.draw.line(self.screen, self.black, (10, int(self.ground)),
-                         (int(self.screen.get_width()) - 10, int(self.ground)), 5)
-
-        for i in range(10, int(self.screen.get_height()), int(self.floor_height)):
-            pygame.draw.line(self.screen, self.black, (int(self.leftwall), i),
-                             (int(self.leftwall) + int(self.floor_width), i), 3)
-
-        return
-
-    def screen_shot(self):
-
-        """This function saves the building defined in the __init__ function as a picture
-            that can then be loaded. """
-
-        pygame.image.save(self.screen, "background.bmp")
-
-        return
-
-
-class Customer(pygame.sprite.Sprite):
-    """This class manages all the information about the customers using the lift:
-        ID, direction, their current floor and the floor they want to go to."""
-
-    def __init__(self, floor):
-
-        """Initialisation of the class. The parameters of the customer are defined."""
-
-        pygame.sprite.Sprite.__init__(self)
-        self.ID = random.randrange(1, 100, 1)
-        self.finished = False
-        self.num_of_floors = floor
-        self.cur_floor = random.randrange(0, self.num_of_floors, 1)  # for the sake of better showing the
-        # effectiveness, I am not putting customers on the last floor.
-        self.dst_floor = random.randrange(0, self.num_of_floors, 1)
-        self.direction = -1
-        self.update()
-
-    def update(self):
-
-        """This function decides the direction of the customers"""
-
-        # finds direction by comparing current floor with destination floor
-        if self.dst_floor == self.cur_floor:
-            self.finished = True
-            self.direction = -1
-        elif self.cur_floor < self.dst_floor:
-            self.direction = 1
-            self.finished = False
-        else:
-            self.direction = 0
-            self.finished = False
+        if viewport.first == 0:
+            pygame.draw.line(self.image, self.black, (10, int(self.ground)),
+                             (int(self.screen.get_width()) - 10, int(self.ground)), 5)
+
+        band = viewport.band
+        font = get_font(14)
+        # floor numbers at least 16 pixels apart, on round floors that have a line
+        numbers = math.lcm(round_number(16 / viewport.floor_height), band)
+        for floor in viewport.lines():
+            i = int(viewport.pixel(floor))
+            if not 10 <= i <= self.ground:
+                continue
+            pygame.draw.line(self.image, self.black, (int(self.leftwall), i),
+                             (int(self.leftwall) + int(self.floor_width), i), 3 if band == 1 else 1)
+            if self.num_of_floors > viewport.visible_floors and floor < self.num_of_floors and floor % numbers == 0:
+                number = font.render(str(floor), 1, self.black)
+                self.image.blit(number, number.get_rect(bottomright=(int(self.leftwall) - 4, i)))
 
         return
 
 
 class Elevator(pygame.sprite.DirtySprite):
+    """Draws one lift of the simulation engine. The sprite owns no simulation state:
+        it reads the position of its car from the engine every frame."""
+
+    # lift pictures as loaded from the disk, by file name, and scaled to the floor height, by (file name, height)
+    originals = {}
+    images = {}
 
-    def __init__(self, floor_num, position, c):
+    def __init__(self, car, position, viewport):
 
         """Initialisation of the class. Defines the settings of the lift image: position, size, scale..
-        I am not using a picture for the elevator so that it can be rescaled depending on the number of floors."""
+        I am not using a picture for the elevator so that it can be rescaled depending on the number of floors.
+        The lift is only drawn when it is in the part of the building shown by the viewport."""
 
         pygame.sprite.DirtySprite.__init__(self)
         self.screen = pygame.display.get_surface()
 
-        self.num_of_floors = floor_num
-        # floor to start from
-        self.cur_floor = 0
-        # direction to start from -> start from groundfloor so can only go up (1 is up, 0 is down, -1 is stay)
-        self.direction = 1
-        # to keep track of the number of floors stop at
-        self.floor_count = 0
-        # to keep tracked of the number of floors passed
-        self.passed_floor = [0]
-        self.cost = 0
+        self.car = car
+        self.num_of_floors = car.num_of_floors
+        self.viewport = viewport
 
         # width and height of lift
         self.floor_width = self.screen.get_width() * position  # 0.1 for mecha_lift and 0.35 for my_lift
-        self.floor_height = (self.screen.get_height() - 22) / self.num_of_floors
+        self.floor_height = viewport.floor_height
 
         self.hor_margin = self.floor_width * 0.4
         self.ver_margin = self.floor_height * 0.09
 
         self.lift_width = int(self.floor_width)
-        self.lift_height = int(self.floor_height)
-        self.moving = False
-        self.overload = False
-        self.going_up = True
-        self.load = 10
+        # the lift never gets smaller than a few pixels, even when floors are drawn as bands
+        self.lift_height = max(int(self.floor_height - self.ver_margin), MIN_FLOOR_PIXELS)
 
         self.leftwall = self.screen.get_width() * 0.375
-        self.ground = self.screen.get_height() - 17
 
-        self.allcustomer = pygame.sprite.Group()  # basically a list of customers objects ( class customer is sprite
-        # so better in sprite group)
-        self.elevator_customer = pygame.sprite.Group()
-        self.removed_customer = []
-        self.finished_customer = 0
-
-        self.add_customer(pygame.sprite.Group(c))  # add lists of customers to a more global list
-
-        self.cur_pixel = int((self.num_of_floors - self.cur_floor - 1) * self.floor_height + 10 + (self.ver_margin / 2))
-        self.next_floor = int()  # returns floor to go next
+        self.cur_pixel = self.floor_pixel(self.car.cur_floor)
 
         self.load_lift_image()
 
         self.rect = self.image.get_rect().move(int(self.leftwall + self.hor_margin), self.cur_pixel)
 
-    def add_customer(self, customer_list):
-
-        """Adds customers created above to the allcustomer"""
-
-        for customer in customer_list:
-            self.allcustomer.add(customer)
-        self.floor_initialize()
-
-    def floor_initialize(self):
-
-        """This function keeps track of the floors the elevator has to go to depending on the customers.
-            It basically checks when new customer is added. It creates a list of floors to go to """
-
-        self.floor_list = []
-        for floor_num in range(0, self.num_of_floors):
-
-            floor_customer = []
-
-            for i in self.allcustomer:
-                if i.cur_floor == floor_num and i.finished == False and (i not in self.elevator_customer):
-                    floor_customer += (i,)
-            floor = pygame.sprite.Group(floor_customer)  # groups customers by floor
-            self.floor_list += (floor,)  # add groups to a more general list --> list of list
-
-        return
-
     def load_lift_image(self, image_name):
 
         """As the building, this function loads the image of the lift defined at the start of the class.
-        It also resizes the image depending on the number of floors."""
-
-        current_dir = os.path.dirname(os.path.abspath("__file__"))
-        lift_image = os.path.join(current_dir, image_name)
-
-        self.image = pygame.image.load(lift_image)
-        rect = self.image.get_rect()
-        ratio = rect[3] / self.lift_height
-        rect = [i / ratio for i in rect]
-        self.image = pygame.transform.scale(self.image, (int(rect[2]), int(rect[3])))
-
-    def cancel_customer(self, customer_list):
-
-        """This function removes customers of the list when they have reached their desired floor."""
-
-        for customer in customer_list:
-            if self.cur_floor == customer.dst_floor:  # removes customer from the list if it arrives at destination
-                customer.finished = True
-                customer.in_elevator = False
-                customer.cur_floor = self.cur_floor
-                customer.update()
-                customer_list.remove(customer)
-                self.finished_customer += len(self.removed_customer)
+        It also resizes the image depending on the number of floors. The picture is only read from the disk
+        once and only scaled again when the floor height changes."""
+
+        key = (image_name, self.lift_height)
+        if key not in Elevator.images:
+            if image_name not in Elevator.originals:
+                current_dir = os.path.dirname(os.path.abspath(__file__))
+                Elevator.originals[image_name] = pygame.image.load(os.path.join(current_dir, image_name)).convert_alpha()
+            image = Elevator.originals[image_name]
+            rect = image.get_rect()
+            ratio = rect[3] / self.lift_height
+            rect = [i / ratio for i in rect]
+            if len(Elevator.images) >= CACHE_SIZE:
+                Elevator.images.pop(next(iter(Elevator.images)))
+            Elevator.images[key] = pygame.transform.scale(image, (int(rect[2]), int(rect[3])))
+        self.image = Elevator.images[key]
+
+    def floor_pixel(self, floor):
+
+        """Returns the pixel at which the top of the lift is drawn when it is at the given (fractional) floor."""
+
+        return int(self.viewport.pixel(floor) - self.lift_height - self.ver_margin / 2)
+
+    def update(self, now):
+
+        """Moves the sprite to where the car is at the time now, and hides it when it is out of the viewport."""
+
+        position = self.car.position(now)
+        visible = int(self.viewport.shows(position))
+        if visible != self.visible:
+            self.visible = visible
+            self.dirty = 1
+        pixel = self.floor_pixel(position)
+        if pixel != self.cur_pixel:
+            self.rect = self.rect.move(0, pixel - self.cur_pixel)
+            self.cur_pixel = pixel
+            self.dirty = 1
         return
 
-    def next_stop(self):
-
-        """This function decides the next stops that the lift will stop at.
-            It is basically the algorithm for my lift."""
-
-        up = []
-        down = []
-        same = []  # to handle duplicates
-
-        """iterate through the lift of all floors and by comparing the lift current floor to the customer current floor 
-            decide in which list to put the customer"""
-        for i in range(len(self.floor_list)):  # iterates through the list of all floors
-            if len(self.floor_list[i]):  # if there is something
-                for customer in self.floor_list[i]:
-                    if type(self) is My_Elevator:
-                        if self.cur_floor == customer.cur_floor:  # if the customer is on the same floor as the lift
-                            # check the direction of the customer either up or down
-                            same.append(i)
-                        elif self.cur_floor < customer.cur_floor:
-                            up.append(i)
-                        else:
-                            down.append(i)
-                    else:
-                        if self.cur_floor < customer.cur_floor:
-                            up.append(i)
-                        elif self.cur_floor > customer.cur_floor:
-                            down.append(i)
-            # when the lift has served everyone but their is still people inside - only runned at the end
-            elif self.next_floor is None and len(self.elevator_customer):
-                for customer in self.elevator_customer:  # if the list of customers is empty but the lift is not
-                    # empty, go to the destination floor of the customers in the lift
-                    if type(self) is My_Elevator:
-                        if self.cur_floor == customer.dst_floor:
-                            same.append(customer.dst_floor)
-                            self.elevator_customer.remove(customer)
-                        elif self.cur_floor < customer.dst_floor:
-                            up.append(customer.dst_floor)
-                            self.elevator_customer.remove(customer)
-                        else:
-                            down.append(customer.dst_floor)
-                            self.elevator_customer.remove(customer)
-                    else:
-                        if self.cur_floor < customer.dst_floor:
-                            up.append(customer.dst_floor)
-                            self.elevator_customer.remove(customer)
-                        else:
-                            down.append(customer.dst_floor)
-                            self.elevator_customer.remove(customer)
-
-            # only when the lifts have finished
-            if self.next_floor is None and len(self.elevator_customer) == 0:
-                if type(self) is Mecha_Elevator:
-                    print("mecha done")
-                if type(self) is My_Elevator:
-                    print("my done")
-
-        # make sure that the mechanical lift goes to the endpoints
-        if type(self) is Mecha_Elevator:
-            if self.direction == 1 and len(up) == 0 and len(down):
-                up.append(self.num_of_floors - 1)
-            if self.direction == 0 and len(down) == 0 and len(up):
-                up.append(0)
-            if self.cur_floor == self.num_of_floors - 1:
-                self.direction = 0
-            elif self.cur_floor == 0:
-                self.direction = 1
-
-        # if direction is up
-        if self.direction == 1:
-            if not self.overload:
-                if len(up):
-                    return min(up)  # return smallest floor to go up to
-
-        elif self.direction == 0:
-            if not self.overload:
-                if len(down):
-                    return max(down)
-
-        # handles the change of direction from the non mechanical lift
-        if len(same):
-            if self.direction == 0:
-                self.direction = 1
-            elif self.direction == 1:
-                self.direction = 0
-            elif self.direction == -1:
-                self.direction = 1
-            return self.next_stop()
+    def make_labels(self, name, color, x, name_position, name_anchor):
 
-        else:
-            self.direction = -1
+        """Creates the labels giving information on the lift. They are only rendered again when their text changes.
+            Horizontal positions are given for a 640 pixels wide window and follow the width of the window."""
 
-    def move_one_step(self, dst_floor):
+        scale = self.screen.get_width() / 640
+        x = int(x * scale)
+        name_position = (int(name_position[0] * scale), name_position[1])
+        self.labels = [
+            Label(name, 30, color, name_position, name_anchor),
+            Label("", 20, (0, 0, 0), (x, 150), "topleft"),
+            Label("", 20, (0, 0, 0), (x, 170), "topleft"),
+            Label("", 20, (0, 0, 0), (x, 190), "topleft"),
+            Label("", 20, (0, 0, 0), (x, 300), "topleft"),
+            Label("", 20, (0, 0, 0), (x, 320), "topleft"),
+            Label("", 20, (0, 0, 0), (x, 340), "topleft"),
+        ]
+        self.update_labels()
 
-        """The function manages the change in directions. Updward or downward. It also handles "the graphical" maths
-            to check if the lift is at the right place. Decices when the current floor = destination floor"""
-        count = 1
+    def update_labels(self):
 
-        if self.direction == 1:  # moves elevator depending of the direction
-            count = - abs(count)
-        elif self.direction == 0:
-            count = abs(count)
-        else:
-            return
+        """Gives the labels the current values of the lift."""
 
-        tmp = self.num_of_floors - dst_floor - 1
-        dst_floor_pixel = int((self.floor_height * tmp) + 10 + (self.ver_margin / 2))
-
-        # if the current pixel is equal to the destination pixel calculated above
-        if self.cur_pixel == dst_floor_pixel:
-            # means that the current floor is equal to the destination floor --> do the required
-            self.cur_floor = dst_floor
-            # remove the customer from the list of customers and from the elevator
-            self.cancel_customer(self.floor_list[self.cur_floor])
-            self.cancel_customer(self.elevator_customer)
-            # add customer to the list of all removed customers
-            self.removed_customer.append(self.elevator_customer)  # add customer to a list of all finished customers
-
-            # increase the floor count by one
-            self.floor_count += 1
-            # add the floor to the list of floors stopped at to calculate the cost
-            self.passed_floor.append(self.cur_floor)
-            self.cost += abs(
-                self.passed_floor[len(self.passed_floor) - 1] - self.passed_floor[len(self.passed_floor) - 2])
-
-            # register the customer in elevator
-            if self.floor_list[self.cur_floor]:
-                self.register_customer(self.floor_list[self.cur_floor])
-            self.moving = False
-            pygame.time.delay(500)
-            return
+        car = self.car
+        texts = [
+            "Current floor: " + str(car.cur_floor),
+            "People in elevator: " + str(len(car.elevator_customer)),
+            "Delivered at floor: " + str(car.delivered),
+            "Total stops: " + str(car.floor_count),
+            "Total cost: " + str(car.cost),
+            "Total finished customers: " + str(car.finished_customer),
+        ]
+        for label, text in zip(self.labels[1:], texts):
+            label.set_text(text)
 
-        self.rect = self.rect.move(0, count)
-        self.cur_pixel += count
-        self.moving = True
 
-    def register_customer(self, customer_list):
+# titles of the lifts, the other lifts are shown under their name
+TITLES = {"MechaCar": "Mechanical Elevator", "MyCar": "My Elevator"}
 
-        '''Adds customer to the elevator_customer list --> list of customers in the elevator.
-        Customers are added into that list from the big customer_list containing all the customers.'''
 
-        load = len(self.elevator_customer)
+class Mecha_Elevator(Elevator):
+    """class of the lift on the left (the mechanical lift by default). handles position, picture, labels.."""
 
-        for customer in customer_list:
-            # check if lift is not full
-            if load > self.load:
-                self.overload = True
-                return
-            elif customer.finished is False and self.cur_floor == customer.cur_floor and self.direction == customer.direction:
-                self.elevator_customer.add(customer)
-                customer_list.remove(customer)
-            load += 1
+    def __init__(self, car, position, viewport):
+        super().__init__(car, position, viewport)
+        self.make_labels(TITLES.get(car.name, car.name), (0, 0, 255), 50, (26, 50), "topleft")
 
-    def update(self):
+    def load_lift_image(self):
+        image_name = 'mecha_lift.png'
+        super().load_lift_image(image_name)
 
-        """update function"""
 
-        self.next_floor = self.next_stop()
+class My_Elevator(Elevator):
+    """class of the lift on the right (my lift by default). handles position, picture, labels.."""
 
-        if not self.moving:
-            self.register_customer(self.floor_list[self.cur_floor])
+    def __init__(self, car, position, viewport):
+        super().__init__(car, position, viewport)
+        self.make_labels(TITLES.get(car.name, car.name), (255, 0, 0), 430, (555, 50), "topright")
 
-            if self.direction != -1:
+    def load_lift_image(self):
+        image_name = 'my_lift.png'
+        super().load_lift_image(image_name)
 
-                if self.cur_floor < self.next_floor:
-                    self.direction = 1
-                elif self.cur_floor > self.next_floor:
-                    self.direction = 0
 
-            if self.direction == -1:
-                """
-                for customer in self.allcustomer:
-                    print (customer.ID, customer.cur_floor, customer.dst_floor, customer.finished, " direction=> ", customer.direction)
-                """
+# fonts by size and pre-rendered characters by (character, font, color): creating a font and rendering text
+# are the slow parts of drawing labels, so they are done once
+_fonts = {}
+_glyphs = {}
 
-            else:
-                self.move_one_step(self.next_floor)
-        else:
-            self.move_one_step(self.next_floor)
-        self.dirty = 1
-        return
 
+def get_font(size):
 
-class Mecha_Elevator(Elevator):
-    """class of the mechanical lift. handles position, picture, labels.."""
+    """Returns the default font at the given size, created only once."""
 
-    def __init__(self, floor_num, position, c):
-        super().__init__(floor_num, position, c)
+    if size not in _fonts:
+        _fonts[size] = pygame.font.Font(None, size)
+    return _fonts[size]
 
-    def load_lift_image(self):
-        image_name = 'mecha_lift.png'
-        super().load_lift_image(image_name)
 
-    def draw(self, surface):
-        """manages all the labels of the lifts. Gives information on the lift. I am not using them since pygame is really slow with handling these and really slows down my program"""
-        # elevator_name = Label("Mechanical Elevator", 30, (0, 0, 255), (26, 50), "topleft", surface)
-        # current = Label("Current floor: " + str(self.cur_floor), 20, (0, 0, 0), (50, 150), "topleft", surface)
-        # inside = Label("People in elevator: " + str(len(self.elevator_customer)), 20, (0, 0, 0), (50, 170),"topleft", surface)
-        # delivered = Label("Delivered at floor: " + str(len(self.removed_customer)), 20, (0, 0, 0), (50, 190),"topleft", surface)
-        # cost = Label("Total stops: " + str(self.floor_count), 20, (0, 0, 0), (50, 300), "topleft", surface)
-        floor_cost = Label("Total cost: " + str(self.cost), 20, (0, 0, 0), (50, 320), "topleft", surface)
-        # total = Label("Total finished customers: " + str(self.finished_customer), 20, (0, 0, 0), (50, 340), "topleft", surface)
+def render_text(text, font, color):
 
+    """Renders text by putting together pre-rendered characters."""
 
-class My_Elevator(Elevator):
-    """class of the non mechanical lift. handles position, picture, labels.."""
+    glyphs = []
+    for char in text:
+        glyph = _glyphs.get((char, font, color))
+        if glyph is None:
+            glyph = _glyphs[(char, font, color)] = font.render(char, 1, color)
+        glyphs.append(glyph)
+    surface = pygame.Surface((max(sum(glyph.get_width() for glyph in glyphs), 1), font.get_height()), pygame.SRCALPHA)
+    x = 0
+    for glyph in glyphs:
+        surface.blit(glyph, (x, 0))
+        x += glyph.get_width()
+    return surface
 
-    def __init__(self, floor_num, position, c):
-        super().__init__(floor_num, position, c)
-        self.floor_count = 0
 
-    def load_lift_image(self):
-        image_name = 'my_lift.png'
-        super().load_lift_image(image_name)
+class Label(pygame.sprite.DirtySprite):
+    """handles all the labels of the simulation. A label is only rendered again when its text,
+        font or color changes, and is only drawn again by a LayeredDirty group when it changed."""
 
-    def draw(self, surface):
-        """manages all the labels of the lifts. Gives information on the lift. I am not using them since pygame is really slow with handling these and really slows down my program"""
-        # elevator_name = Label("My Elevator", 30, (255, 0, 0), (555, 50), "topright", surface)
-        # current = Label("Current floor: " + str(self.cur_floor), 20, (0, 0, 0), (430, 150), "topleft", surface)
-        # inside = Label("People in elevator: " + str(len(self.elevator_customer)), 20, (0, 0, 0), (430, 170),"topleft", surface)
-        # delivered = Label("Delivered at floor: " + str(len(self.removed_customer)), 20, (0, 0, 0), (430, 190),"topleft", surface)
-        # cost = Label("Total stops: " + str(self.floor_count), 20, (0, 0, 0), (430, 300), "topleft", surface)
-        floor_cost = Label("Total cost: " + str(self.cost), 20, (0, 0, 0), (430, 320), "topleft", surface)
-        # total = Label("Total finished customers: " + str(self.finished_customer), 20, (0, 0, 0), (430, 340), "topleft", surface)
-
-
-class Label(Sprite):
-    """handles all the labels of the simulation."""
-
-    def __init__(self, text, size, color, position, anchor, surface):
-        Sprite.__init__(self)
-        self._font = pygame.font.Font(None, size)
+    def __init__(self, text, size, color, position, anchor, surface=None):
+        pygame.sprite.DirtySprite.__init__(self)
+        self._font = get_font(size)
         self._text = text
         self._color = color
         self._anchor = anchor
         self._position = position
         self._surface = surface
         self._render()
-        self.draw(self._surface)
+        if surface is not None:
+            self.draw(self._surface)
 
     def _render(self):
-        self.image = self._font.render(self._text, 1, self._color)
+        self.image = render_text(self._text, self._font, self._color)
         self.rect = self.image.get_rect(**{self._anchor: self._position})
+        self.dirty = 1
 
     def clip(self, rect):
         self.image = self.image.subsurface(rect)
         self.rect = self.image.get_rect(**{self._anchor: self._position})
+        self.dirty = 1
 
     def draw(self, surface):
         surface.blit(self.image, self.rect)
 
     def set_text(self, text):
-        self._text = text
-        self._render()
+        if text != self._text:
+            self._text = text
+            self._render()
 
     def set_font(self, font):
         self._font = font
@@ -493,48 +407,257 @@ class Label(Sprite):
             self._anchor = anchor
 
         self.rect = self.image.get_rect(**{self._anchor: self._position})
+        self.dirty = 1
+
+
+class Overview(pygame.sprite.DirtySprite):
+    """The whole building in a narrow strip on the right of the window. Floors are put together in bands of a few
+        pixels, the darker a band the more of its floors have people waiting. The part of the building shown by the
+        viewport is framed and the lifts are marked with their colour."""
+
+    def __init__(self, cars, colors, viewport):
+        pygame.sprite.DirtySprite.__init__(self)
+        screen = pygame.display.get_surface()
+        self.cars = cars
+        self.colors = colors
+        self.viewport = viewport
+        self.rect = pygame.Rect(screen.get_width() - 24, 10, 14, int(viewport.bottom) - 10)
+        self.image = pygame.Surface(self.rect.size).convert()
+        # floors in every band of 3 pixels
+        self.band = max(1, math.ceil(viewport.num_of_floors / max(self.rect.height // 3, 1)))
+        self.drawn = None
+        self.update(0.0)
+
+    def y(self, floor):
+        return int(self.rect.height - floor / self.viewport.num_of_floors * self.rect.height)
+
+    def update(self, now):
+
+        """Draws the strip again when the simulation or the viewport changed."""
+
+        if self.drawn == (now, self.viewport.key()):
+            return
+        self.drawn = (now, self.viewport.key())
+        self.image.fill((255, 255, 255))
+        waiting = 0
+        for car in self.cars:
+            waiting |= car.calls.hall[0].mask | car.calls.hall[1].mask
+        band = self.band
+        for floor in range(0, self.viewport.num_of_floors, band):
+            count = bin((waiting >> floor) & ((1 << band) - 1)).count("1")
+            if count:
+                shade = 255 - int(200 * count / band)
+                top = self.y(floor + band)
+                self.image.fill((shade, shade, shade), (0, top, self.rect.width, max(self.y(floor) - top, 1)))
+        viewport = self.viewport
+        top = self.y(viewport.first + viewport.visible_floors)
+        pygame.draw.rect(self.image, (0, 160, 0), (0, top, self.rect.width, max(self.y(viewport.first) - top, 2)), 1)
+        for car, color in zip(self.cars, self.colors):
+            y = self.y(car.position(now) + 0.5)
+            pygame.draw.line(self.image, color, (2, y), (self.rect.width - 3, y), 2)
+        self.dirty = 1
+
+
+class ProfileOverlay(pygame.sprite.DirtySprite):
+    """Timings of the last frames shown on screen (press F3 to show or hide them): frame time, steps of the
+        simulation per second and time of every phase of the main loop and of the lifts. The panel is only drawn
+        again every few frames so that the overlay itself costs almost nothing."""
+
+    # phases of the main loop, in order
+    PHASES = ("events", "simulation", "labels", "update", "draw", "display")
+
+    def __init__(self, profiler, sim, every=15):
+        pygame.sprite.DirtySprite.__init__(self)
+        self.profiler = profiler
+        self.every = every
+        self.names = list(self.PHASES) + ["next_stop %d %s" % (i, car.name) for i, car in enumerate(sim.cars)]
+        self.font = get_font(16)
+        self.line_height = self.font.get_linesize()
+        self.image = pygame.Surface((220, self.line_height * (len(self.names) + 1) + 6), pygame.SRCALPHA)
+        self.rect = self.image.get_rect()
+        self.render()
+
+    def place(self, screen):
+
+        """Puts the panel at the bottom left of the window, above the floors label."""
+
+        self.rect.bottomleft = (5, screen.get_height() - 42)
+        self.dirty = 1
+
+    def render(self):
+        profiler = self.profiler
+        frame = profiler.mean("frame")
+        lines = ["frame %.1f ms (%.0f fps), %.0f steps/s" % (
+            frame * 1e3, 1 / frame if frame else 0, profiler.mean("steps") / frame if frame else 0)]
+        lines += ["%s %.3f ms" % (name, profiler.mean(name) * 1e3) for name in self.names]
+        self.image.fill((255, 255, 255, 225))
+        for i, line in enumerate(lines):
+            self.image.blit(render_text(line, self.font, (0, 120, 0)), (5, 3 + i * self.line_height))
+        self.dirty = 1
+
+    def update(self, now):
+        if self.profiler.frame % self.every == 0:
+            self.render()
+
+
+def make_scene(screen, sim, viewport, *labels):
+
+    """Creates the building and the lift sprites for the current window size and viewport. Returns the lift sprites
+        and the group of all sprites: only the sprites that changed are drawn again, over the background, and only
+        their rectangles are updated."""
+
+    viewport.bottom = screen.get_height() - 10
+    building = Building(sim.num_of_floors, viewport)
+    elevators = [Mecha_Elevator(sim.cars[0], 0.1, viewport), My_Elevator(sim.cars[1], 0.35, viewport)]
+    sprites = pygame.sprite.LayeredDirty(*elevators)
+    for elevator in elevators:
+        sprites.add(*elevator.labels)
+    sprites.add(Overview(sim.cars, ((0, 0, 255), (255, 0, 0)), viewport))
+    for label in labels:
+        label.dirty = 1
+        sprites.add(label)
+    sprites.clear(screen, building.image)
+    screen.blit(building.image, (0, 0))
+    pygame.display.update()
+    return elevators, sprites
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Watch the lifts.")
+    parser.add_argument("scenario", nargs="?", default=None, help="scenario file written by record.py to replay")
+    parser.add_argument("--cars", nargs=2, default=["MechaCar", "MyCar"], choices=list(CARS),
+                        help="the two lifts shown, left and right")
+    parser.add_argument("--overlay", action="store_true", help="show the timings of the frames (F3 toggles it)")
+    parser.add_argument("--profile", default=None,
+                        help="write a cProfile (.pstats) or Chrome trace (.json) of a window of frames")
+    parser.add_argument("--profile-start", type=int, default=60, help="first frame written to the profile")
+    parser.add_argument("--profile-frames", type=int, default=120, help="number of frames written to the profile")
+    parser.add_argument("--record", default=None,
+                        help="record the window to a PNG directory, a .y4m or a .rgb file (see recorder.py)")
+    args = parser.parse_args()
+    if args.record:
+        # numpy is only needed to record
+        from recorder import FrameWriter, format_of
+        try:
+            format_of(args.record)
+        except ValueError as error:
+            parser.error(str(error))
+
     pygame.init()
-    current_dir = os.path.dirname(os.path.abspath("__file__"))
 
-    screen = pygame.display.set_mode((640, 480))
+    screen = pygame.display.set_mode((640, 480), pygame.RESIZABLE)
     pygame.display.set_caption("Elevators simulation")
+    clock = pygame.time.Clock()
 
-    # change the value to change the number of floors. (preferably between 5 and 100 but can go higher)
+    # change the value to change the number of floors. (preferably between 5 and 100 but can go much higher:
+    # only MAX_VISIBLE_FLOORS floors are shown at once)
     total_floors = 20
 
-    building = Building(total_floors)
-
     c = []
-
-    for i in range(0, 10):  # create list of Customers
-        c.append(Customer(total_floors), )
-
-    mecha_elevator = Mecha_Elevator(total_floors, 0.1, c)
-    mecha_lift = pygame.sprite.LayeredDirty(mecha_elevator)
-
-    myelevator = My_Elevator(total_floors, 0.35, c)
-    lift = pygame.sprite.LayeredDirty(myelevator)
+    arrivals = None
+
+    if args.scenario:
+        # replay a scenario written by record.py: python main.py scenario.rec
+        from record import open_records, replay
+        total_floors = open_records(args.scenario)[0]
+        arrivals = replay(args.scenario)
+    else:
+        for i in range(0, 10):  # create list of Customers
+            c.append(Customer(total_floors), )
+
+    # every car gets its own copy of the customers. The lifts speed up and slow down like real ones
+    sim = Simulation(total_floors, c, [CARS[name] for name in args.cars], motion=Kinematic(), arrivals=arrivals)
+
+    speed = SPEEDS[1]
+    speed_label = Label("", 20, (0, 0, 0), (10, 10), "topleft")
+    view_label = Label("", 20, (0, 0, 0), (10, screen.get_height() - 40), "topleft")
+    viewport = Viewport(total_floors, 10, screen.get_height() - 10)
+
+    # timings of the phases of every frame, and of the decisions of the lifts
+    profiler = Profiler()
+    profiler.instrument(sim)
+    if args.profile:
+        profiler.trace(args.profile, args.profile_start, args.profile_frames)
+    overlay = ProfileOverlay(profiler, sim)
+    overlay.place(screen)
+    show_overlay = args.overlay
+    # frames are dropped rather than slowing the window down when the writer is behind
+    writer = FrameWriter(args.record, FPS) if args.record else None
+    elevators, sprites = make_scene(screen, sim, viewport, speed_label, view_label,
+                                    *((overlay,) if show_overlay else ()))
 
     while True:
 
+        start = profiler.clock()
+        view = viewport.key()
+        step = max(1, viewport.visible_floors // 10)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                profiler.close()
+                if writer is not None:
+                    writer.close()
                 sys.exit()
-
-        screen.blit(building.image, (0, 0))
-
-        mecha_elevator.draw(screen)
-        mecha_lift.update()
-        mecha_lift.draw(screen)
-
-        myelevator.draw(screen)
-        lift.update()
-        lift.draw(screen)
-
-        pygame.display.update()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                show_overlay = not show_overlay
+                view = None
+            if event.type == pygame.KEYDOWN and pygame.K_1 <= event.key < pygame.K_1 + len(SPEEDS):
+                speed = SPEEDS[event.key - pygame.K_1]
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_UP:
+                    viewport.scroll(step)
+                elif event.key == pygame.K_DOWN:
+                    viewport.scroll(-step)
+                elif event.key == pygame.K_PAGEUP:
+                    viewport.scroll(viewport.visible_floors)
+                elif event.key == pygame.K_PAGEDOWN:
+                    viewport.scroll(-viewport.visible_floors)
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    viewport.zoom(0.5)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    viewport.zoom(2)
+            if event.type == pygame.MOUSEWHEEL:
+                viewport.scroll(event.y * step)
+            if event.type == pygame.VIDEORESIZE:
+                screen = pygame.display.get_surface()
+                view = None
+        if view != viewport.key():
+            view_label.set_position((10, screen.get_height() - 40))
+            overlay.place(screen)
+            elevators, sprites = make_scene(screen, sim, viewport, speed_label, view_label,
+                                            *((overlay,) if show_overlay else ()))
+        profiler.add("events", start)
+
+        # the simulation moves on with the real time (times the speed) and the screen is drawn FPS times per second,
+        # however many events the simulation handles in between
+        elapsed = clock.tick(FPS) / 1000
+        profiler.end_frame()
+        start = profiler.clock()
+        steps = sim.handled
+        if speed is None:
+            deadline = time.perf_counter() + FRAME_BUDGET
+            while time.perf_counter() < deadline and sim.step():
+                pass
+        else:
+            sim.run(until=sim.now + elapsed * speed)
+        profiler.count("steps", sim.handled - steps)
+        start = profiler.add("simulation", start)
+
+        for elevator in elevators:
+            elevator.update_labels()
+        speed_label.set_text("Speed: " + ("max" if speed is None else str(speed) + "x"))
+        view_label.set_text("Floors %d-%d of %d" % (int(viewport.first),
+                                                   int(viewport.first) + viewport.visible_floors - 1, total_floors))
+        start = profiler.add("labels", start)
+
+        sprites.update(sim.now)
+        start = profiler.add("update", start)
+        rects = sprites.draw(screen)
+        start = profiler.add("draw", start)
+        pygame.display.update(rects)
+        start = profiler.add("display", start)
+        if writer is not None:
+            writer.put(screen)
+            profiler.add("record", start)
 
     pygame.quit()
 
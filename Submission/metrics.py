@@ -0,0 +1,168 @@
+"""Latency metrics of the customers: wait time (call to getting in), ride time (getting in to getting out)
+and journey time (call to getting out).
+
+Times are recorded by the lifts when customers get in and out, and kept in streaming histograms with
+logarithmic buckets: memory does not grow with the number of customers and percentiles are exact to
+about 1%. Histograms are kept for every algorithm, for all floors and for every floor of origin, and can
+be exported as JSONL or CSV.
+"""
+
+import csv
+import json
+import math
+
+KINDS = ("wait", "ride", "journey")
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+    """Streaming histogram of positive values. Bucket i holds values in [base ** i, base ** (i + 1)),
+        values below min_value are counted in a single bucket. Only buckets that were used are stored."""
+
+    def __init__(self, precision=0.01, min_value=0.01):
+
+        """Initialisation of the class. precision is the relative width of the buckets."""
+
+        self.base = 1 + precision
+        self.log_base = math.log(self.base)
+        self.min_value = min_value
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.min = math.inf
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.min = min(self.min, value)
+        bucket = -1 if value < self.min_value else int(math.log(value / self.min_value) / self.log_base)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.min = min(self.min, other.min)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def percentile(self, q):
+
+        """Value below which q percent of the values are (middle of the bucket, clipped to min and max)."""
+
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                if bucket < 0:
+                    return self.min
+                value = self.min_value * self.base ** (bucket + 0.5)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self):
+        summary = {"count": self.count, "mean": self.mean}
+        for q in PERCENTILES:
+            summary["p%d" % q] = self.percentile(q)
+        summary["max"] = self.max if self.count else None
+        return summary
+
+
+class LatencyStats:
+    """Wait, ride and journey histograms of one algorithm, for all floors and by floor of origin."""
+
+    def __init__(self):
+        self.all = {kind: Histogram() for kind in KINDS}
+        self.floors = {}
+
+    def _floor(self, floor):
+        if floor not in self.floors:
+            self.floors[floor] = {kind: Histogram() for kind in KINDS}
+        return self.floors[floor]
+
+    def record(self, kind, floor, value):
+        self.all[kind].add(value)
+        self._floor(floor)[kind].add(value)
+
+    def board(self, floor, wait):
+
+        """A customer who called the lift from floor gets in after waiting wait seconds."""
+
+        self.record("wait", floor, wait)
+
+    def alight(self, floor, ride, journey):
+
+        """A customer who called the lift from floor gets out."""
+
+        self.record("ride", floor, ride)
+        self.record("journey", floor, journey)
+
+
+class Metrics:
+    """Latency statistics of every algorithm of a simulation (or of many simulations)."""
+
+    def __init__(self):
+        self.algorithms = {}
+
+    def get(self, name):
+
+        """Statistics of the algorithm name, created on first use."""
+
+        if name not in self.algorithms:
+            self.algorithms[name] = LatencyStats()
+        return self.algorithms[name]
+
+    def rows(self, by_floor=True):
+
+        """One dict per (algorithm, floor, kind). floor is "all" for the whole building."""
+
+        rows = []
+        for name, stats in self.algorithms.items():
+            groups = [("all", stats.all)]
+            if by_floor:
+                groups += sorted(stats.floors.items())
+            for floor, histograms in groups:
+                for kind in KINDS:
+                    row = {"algorithm": name, "floor": floor, "metric": kind}
+                    row.update(histograms[kind].summary())
+                    rows.append(row)
+        return rows
+
+    def to_jsonl(self, path, by_floor=True):
+        with open(path, "w") as f:
+            for row in self.rows(by_floor):
+                f.write(json.dumps(row) + "\n")
+
+    def to_csv(self, path, by_floor=True):
+        rows = self.rows(by_floor)
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, ["algorithm", "floor", "metric", "count", "mean"] +
+                                    ["p%d" % q for q in PERCENTILES] + ["max"])
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def export(self, path, by_floor=True):
+
+        """Writes the statistics to path, as CSV if it ends with .csv and as JSONL otherwise."""
+
+        if path.endswith(".csv"):
+            self.to_csv(path, by_floor)
+        else:
+            self.to_jsonl(path, by_floor)
+
+    def print_report(self):
+        print("%-12s %-8s %8s %9s %9s %9s %9s %9s" % ("algorithm", "metric", "count", "mean", "p50", "p95", "p99", "max"))
+        for row in self.rows(by_floor=False):
+            if row["count"]:
+                print("%-12s %-8s %8d %9.1f %9.1f %9.1f %9.1f %9.1f" % (
+                    row["algorithm"], row["metric"], row["count"], row["mean"], row["p50"], row["p95"], row["p99"],
+                    row["max"]))
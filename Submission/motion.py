@@ -0,0 +1,162 @@
+"""Motion of the lifts between two floors.
+
+The engine only needs to know how long a trip takes, to schedule the arrival, and the viewer where a
+lift is at a given time, to draw it. Both are computed in closed form from the length of the trip,
+so the result does not depend on the frame rate or the size of the window, and a trip of 500 floors
+costs as much as a trip of one.
+
+Linear is the model the engine always had: a fixed time per floor. Kinematic is a real lift limited
+in speed, acceleration and jerk (S-curve profile): short trips never reach full speed and long trips
+cruise most of the way.
+
+    python motion.py --floors 30 --speed 2.5 --accel 1.0 --jerk 1.5
+"""
+
+import argparse
+import math
+
+
+class Linear:
+    """The lift moves at constant speed: floor_time seconds per floor, with no acceleration."""
+
+    def __init__(self, floor_time=1.0):
+        self.floor_time = floor_time
+
+    def travel_time(self, floors):
+
+        """Time (in seconds) to travel floors floors."""
+
+        return floors * self.floor_time
+
+    def distance(self, floors, elapsed):
+
+        """Floors travelled after elapsed seconds of a trip of floors floors."""
+
+        if self.floor_time <= 0:
+            return floors
+        return min(max(elapsed / self.floor_time, 0.0), floors)
+
+
+class Kinematic:
+    """The lift is limited in speed (m/s), acceleration (m/s^2) and jerk (m/s^3). Every trip starts and ends
+        at rest and follows the fastest profile within the limits: jerk up, constant acceleration, jerk down,
+        cruise, and the same backwards to stop. jerk can be math.inf for a trapezoidal speed profile."""
+
+    def __init__(self, floor_height=3.0, max_speed=2.5, max_accel=1.0, max_jerk=1.5):
+
+        """Initialisation of the class. floor_height is the distance between two floors in metres."""
+
+        if min(floor_height, max_speed, max_accel, max_jerk) <= 0:
+            raise ValueError("floor_height, max_speed, max_accel and max_jerk must be positive")
+        self.floor_height = floor_height
+        self.max_speed = max_speed
+        self.max_accel = max_accel
+        self.max_jerk = max_jerk
+        # trips shorter than this never reach max_speed
+        self.cruise_distance = 2 * self._accel_distance(max_speed)
+
+    @property
+    def floor_time(self):
+
+        """Time per floor at full speed, the cost of one more floor on a long trip."""
+
+        return self.floor_height / self.max_speed
+
+    def _accel_time(self, speed):
+
+        """Time to go from rest to speed. Max acceleration is only reached if speed is high enough."""
+
+        jerk_time = self.max_accel / self.max_jerk
+        if speed * self.max_jerk >= self.max_accel ** 2:
+            return speed / self.max_accel + jerk_time
+        return 2 * math.sqrt(speed / self.max_jerk)
+
+    def _accel_distance(self, speed):
+
+        """Distance to go from rest to speed. The speed profile is symmetric, so the mean speed is speed / 2."""
+
+        return speed * self._accel_time(speed) / 2
+
+    def peak_speed(self, length):
+
+        """Highest speed of a trip of length metres."""
+
+        if length >= self.cruise_distance:
+            return self.max_speed
+        a, j = self.max_accel, self.max_jerk
+        # max acceleration is not reached: length / 2 = v * sqrt(v / j)
+        speed = (length / 2 * math.sqrt(j)) ** (2 / 3)
+        if speed * j <= a * a:
+            return speed
+        # max acceleration is reached: length / 2 = v * (v / a + a / j) / 2
+        b = a * a / j
+        return (-b + math.sqrt(b * b + 4 * a * length)) / 2
+
+    def phases(self, floors):
+
+        """Phases of a trip of floors floors as a list of (duration, acceleration at the start, jerk)."""
+
+        length = abs(floors) * self.floor_height
+        if length <= 0:
+            return []
+        speed = self.peak_speed(length)
+        a, j = self.max_accel, self.max_jerk
+        if speed * j >= a * a:
+            jerk_time = a / j
+            accel_time = speed / a - jerk_time
+            peak = a
+        else:
+            jerk_time = math.sqrt(speed / j)
+            accel_time = 0.0
+            peak = j * jerk_time
+        cruise_time = max(length - 2 * self._accel_distance(speed), 0.0) / speed
+        if math.isinf(j):
+            j, jerk_time = 0.0, 0.0
+        return [(jerk_time, 0.0, j), (accel_time, peak, 0.0), (jerk_time, peak, -j), (cruise_time, 0.0, 0.0),
+                (jerk_time, 0.0, -j), (accel_time, -peak, 0.0), (jerk_time, -peak, j)]
+
+    def travel_time(self, floors):
+
+        """Time (in seconds) to travel floors floors, starting and ending at rest."""
+
+        length = abs(floors) * self.floor_height
+        if length <= 0:
+            return 0.0
+        speed = self.peak_speed(length)
+        return 2 * self._accel_time(speed) + max(length - 2 * self._accel_distance(speed), 0.0) / speed
+
+    def distance(self, floors, elapsed):
+
+        """Floors travelled after elapsed seconds of a trip of floors floors. Only used to draw the lifts."""
+
+        if elapsed <= 0:
+            return 0.0
+        position = speed = 0.0
+        for duration, accel, jerk in self.phases(floors):
+            t = min(duration, elapsed)
+            position += speed * t + accel * t * t / 2 + jerk * t ** 3 / 6
+            speed += accel * t + jerk * t * t / 2
+            elapsed -= t
+            if elapsed <= 0:
+                break
+        return min(position / self.floor_height, abs(floors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the travel time of trips of every length.")
+    parser.add_argument("--floors", type=int, default=30)
+    parser.add_argument("--floor-height", type=float, default=3.0)
+    parser.add_argument("--speed", type=float, default=2.5)
+    parser.add_argument("--accel", type=float, default=1.0)
+    parser.add_argument("--jerk", type=float, default=1.5)
+    args = parser.parse_args()
+
+    motion = Kinematic(args.floor_height, args.speed, args.accel, args.jerk)
+    print("%6s %10s %12s" % ("floors", "time (s)", "peak (m/s)"))
+    for floors in range(1, args.floors + 1):
+        print("%6d %10.2f %12.2f" % (floors, motion.travel_time(floors),
+                                     motion.peak_speed(floors * args.floor_height)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Offline optimal solver: the best a single lift could do if it knew all the customers in advance.
+
+The scenario is fully known at time 0 (like the customers given to engine.Simulation). The solver looks
+for the sequence of stops, and the customers getting in at every stop, that delivers everyone with the
+lowest cost: the number of floors travelled (Car.cost) or the total wait of the customers. The capacity of
+the lift (load) is respected. Unlike the lifts of the engine, the solver lets customers get in whatever the
+direction of the lift, so its result is a lower bound for every algorithm and the gap of an algorithm is
+how much it loses against the best possible.
+
+Small scenarios are solved exactly by dynamic programming over the sub-states (floor of the lift, customers
+still waiting, customers inside), large ones by beam search, which keeps the best width partial solutions
+after every stop.
+
+    python optimal.py --floors 20 --passengers 50 --seed 1
+"""
+
+import argparse
+import math
+import time
+
+from passengers import PassengerTable
+
+OBJECTIVES = ("cost", "wait")
+
+
+class Solution:
+    """Result of the solver: the cost, the stops as a list of (floor, customers getting in) with customers given
+        as (cur_floor, dst_floor) groups, and whether the cost is the optimum or only the best found."""
+
+    def __init__(self, cost, stops, exact, states, bound=None):
+        self.cost = cost
+        self.stops = stops
+        self.exact = exact
+        # lower bound of the optimum (the optimum itself for an exact solution)
+        self.bound = cost if bound is None else bound
+        # number of sub-states looked at
+        self.states = states
+
+    def gap(self, cost):
+
+        """Relative gap (0.1 is 10% worse) of an algorithm of the given cost against this solution."""
+
+        if self.cost == 0:
+            return 0.0 if cost == 0 else float("inf")
+        return (cost - self.cost) / self.cost
+
+
+class Solver:
+    """Solves one scenario for one lift starting at the ground floor with its doors open (as in the engine)."""
+
+    def __init__(self, floors, customers, load=10, objective="cost", floor_time=1.0, stop_time=4.0):
+
+        """Initialisation of the class. customers is a PassengerTable or a list of Customer. Customers going to
+            the same floor from the same floor are interchangeable, so they are counted in groups."""
+
+        if objective not in OBJECTIVES:
+            raise ValueError("objective must be one of %s" % (OBJECTIVES,))
+        self.floors = floors
+        self.load = load
+        self.objective = objective
+        self.floor_time = floor_time
+        self.stop_time = stop_time
+
+        customers = PassengerTable.from_customers(customers)
+        counts = {}
+        for handle in range(len(customers)):
+            trip = (customers.cur_floor[handle], customers.dst_floor[handle])
+            if trip[0] != trip[1]:
+                counts[trip] = counts.get(trip, 0) + 1
+        self.groups = sorted(counts)
+        self.waiting = tuple(counts[trip] for trip in self.groups)
+        # groups waiting at every floor
+        self.at_floor = [[i for i, trip in enumerate(self.groups) if trip[0] == floor] for floor in range(floors)]
+
+    def solve(self, exact=None, width=200, max_states=20000):
+
+        """Exact solution if exact is True, beam search of the given width if it is False. By default the exact
+            solution is tried first and beam search is used if more than max_states sub-states are needed."""
+
+        if exact is None or exact:
+            try:
+                return self.solve_exact(max_states if exact is None else None)
+            except _TooLarge:
+                pass
+        return self.solve_beam(width)
+
+    # stops
+
+    def boardings(self, floor, waiting, room, exact):
+
+        """Possible ways to let customers waiting at floor get in, as tuples of (group, count). All of them if
+            exact, otherwise only the greedy one: as many as fit, the closest destinations first."""
+
+        groups = [i for i in self.at_floor[floor] if waiting[i]]
+        if not groups or not room:
+            return [()]
+        if not exact:
+            groups.sort(key=lambda i: abs(self.groups[i][1] - floor))
+            taken = []
+            for i in groups:
+                count = min(waiting[i], room)
+                if count:
+                    taken.append((i, count))
+                    room -= count
+            return [tuple(taken)]
+        choices = [()]
+        for i in groups:
+            choices = [choice + ((i, count),) if count else choice
+                       for choice in choices
+                       for count in range(0, min(waiting[i], room - sum(c for _, c in choice)) + 1)]
+        return choices
+
+    def moves(self, floor, waiting, inside, exact):
+
+        """Next stops from floor. Every stop lets someone out or in, so that the solver always moves on.
+            Yields (next floor, boarding, waiting, inside) after the stop.
+            When the cost is the number of floors, stopping is free, so the lift never passes a floor where
+            customers get out, and never passes customers when they all fit until the end: it only goes to the
+            closest such floor above or below (the beam search always does)."""
+
+        load = sum(inside)
+        targets = {self.groups[i][0] for i, count in enumerate(waiting) if count and load < self.load}
+        targets.update(f for f, count in enumerate(inside) if count)
+        targets.discard(floor)
+        if self.objective == "cost":
+            free = sum(waiting) + load <= self.load  # the capacity cannot get in the way any more
+            sides = (sorted(f for f in targets if f > floor), sorted((f for f in targets if f < floor), reverse=True))
+        else:
+            free = False
+            sides = (targets,)
+        for side in sides:
+            for target in side:
+                room = self.load - load + inside[target]
+                for boarding in self.boardings(target, waiting, room, exact and not free):
+                    if boarding or inside[target]:
+                        yield (target, boarding) + self.apply(target, boarding, waiting, inside)
+                if self.objective == "cost" and (inside[target] or free or not exact):
+                    break
+
+    def apply(self, floor, boarding, waiting, inside):
+
+        """State after a stop at floor: customers going to floor get out and boarding get in."""
+
+        waiting = list(waiting)
+        inside = list(inside)
+        inside[floor] = 0
+        for i, count in boarding:
+            waiting[i] -= count
+            inside[self.groups[i][1]] += count
+        return tuple(waiting), tuple(inside)
+
+    def step_cost(self, floor, target, waiting):
+
+        """Cost of going from floor to target. For the wait, every customer still waiting before the stop waits
+            for the doors to close, the trip and the doors to open."""
+
+        if self.objective == "cost":
+            return abs(target - floor)
+        return sum(waiting) * (self.stop_time + abs(target - floor) * self.floor_time)
+
+    def bound(self, floor, waiting, inside):
+
+        """Lower bound of the cost to deliver everyone from this state. For the number of floors, every floor
+            boundary between the lift and the calls has to be crossed at least once, and at least often enough to
+            carry everyone who crosses it load customers at a time. Crossings go up and down in turns."""
+
+        if self.objective == "cost":
+            # customers crossing every boundary up and down, as difference arrays
+            up = [0] * (self.floors + 1)
+            down = [0] * (self.floors + 1)
+            low, high = floor, floor
+            trips = [(self.groups[i], count) for i, count in enumerate(waiting) if count]
+            trips += [((floor, f), count) for f, count in enumerate(inside) if count]
+            for (origin, destination), count in trips:
+                if origin < destination:
+                    up[origin] += count
+                    up[destination] -= count
+                else:
+                    down[destination] += count
+                    down[origin] -= count
+                low, high = min(low, origin, destination), max(high, origin, destination)
+            total = 0
+            crossing_up = crossing_down = 0
+            for k in range(low, high):
+                # boundary between floors k and k + 1
+                crossing_up += up[k]
+                crossing_down += down[k]
+                ups = -(-crossing_up // self.load)
+                downs = -(-crossing_down // self.load)
+                if floor > k:
+                    ups, downs = downs, ups  # the lift starts above: the first crossing goes down
+                ups = max(ups, 1)
+                total += 2 * downs if downs >= ups else ups + max(downs, ups - 1)
+            return total
+        return sum(count * (self.stop_time + abs(self.groups[i][0] - floor) * self.floor_time)
+                   for i, count in enumerate(waiting) if count)
+
+    def start(self, exact):
+
+        """States after the first boarding at the ground floor, at time 0."""
+
+        inside = (0,) * self.floors
+        for boarding in self.boardings(0, self.waiting, self.load, exact):
+            yield (boarding,) + self.apply(0, boarding, self.waiting, inside)
+
+    # exact solution
+
+    def solve_exact(self, max_states=None):
+        self._best = {}
+        self._max_states = max_states
+        best = None
+        for boarding, waiting, inside in self.start(True):
+            cost = self._exact(0, waiting, inside)
+            if best is None or cost < best[0]:
+                best = (cost, boarding, waiting, inside)
+        cost, boarding, waiting, inside = best
+        stops = [(0, self._trips(boarding))]
+        floor = 0
+        while (floor, waiting, inside) in self._best and self._best[floor, waiting, inside][1] is not None:
+            _, (floor, boarding, waiting, inside) = self._best[floor, waiting, inside]
+            stops.append((floor, self._trips(boarding)))
+        return Solution(cost, stops, True, len(self._best))
+
+    def _exact(self, floor, waiting, inside):
+
+        """Lowest cost from a state, remembered with the best next stop for every state."""
+
+        key = (floor, waiting, inside)
+        if key in self._best:
+            return self._best[key][0]
+        if self._max_states is not None and len(self._best) >= self._max_states:
+            raise _TooLarge()
+        # nothing left to do, or a dead end (customers left waiting at this floor with nowhere else to go)
+        best = (0 if not any(waiting) and not any(inside) else math.inf, None)
+        for target, boarding, next_waiting, next_inside in self.moves(floor, waiting, inside, True):
+            cost = self.step_cost(floor, target, waiting) + self._exact(target, next_waiting, next_inside)
+            if cost < best[0]:
+                best = (cost, (target, boarding, next_waiting, next_inside))
+        self._best[key] = best
+        return best[0]
+
+    # beam search
+
+    def solve_beam(self, width=200):
+        # a node is (cost so far + bound, cost so far, floor, waiting, inside, stops)
+        beam = []
+        for boarding, waiting, inside in self.start(False):
+            beam.append((self.bound(0, waiting, inside), 0, 0, waiting, inside, ((0, boarding),)))
+        # the greedy first boarding is not always the best one, but no other one has a lower bound: customers
+        # getting in at the ground floor cross the same floors as when they wait there, and the bound of the wait
+        # only counts how many are left at the ground floor, which is fewest when as many as fit get in
+        bound = beam[0][0]
+        best = None
+        states = 0
+        while beam:
+            children = {}
+            for _, cost, floor, waiting, inside, stops in beam:
+                if not any(waiting) and not any(inside):
+                    if best is None or cost < best[0]:
+                        best = (cost, stops)
+                    continue
+                for target, boarding, next_waiting, next_inside in self.moves(floor, waiting, inside, False):
+                    next_cost = cost + self.step_cost(floor, target, waiting)
+                    key = (target, next_waiting, next_inside)
+                    if key not in children or next_cost < children[key][1]:
+                        children[key] = (next_cost + self.bound(target, next_waiting, next_inside), next_cost,
+                                         target, next_waiting, next_inside, stops + ((target, boarding),))
+            states += len(children)
+            beam = sorted(children.values(), key=lambda node: node[:2])[:width]
+            if best is not None:
+                beam = [node for node in beam if node[0] < best[0]]
+        cost, stops = best
+        return Solution(cost, [(floor, self._trips(boarding)) for floor, boarding in stops], False, states, bound)
+
+    def _trips(self, boarding):
+        return [(self.groups[i], count) for i, count in boarding]
+
+
+class _TooLarge(Exception):
+    """Raised when the exact solution needs more sub-states than allowed."""
+
+
+def main():
+    from engine import CARS, Simulation
+
+    parser = argparse.ArgumentParser(description="Compare the lift algorithms with the offline optimum.")
+    parser.add_argument("--floors", type=int, default=20)
+    parser.add_argument("--passengers", type=int, default=50)
+    parser.add_argument("--load", type=int, default=10)
+    parser.add_argument("--objective", default="cost", choices=OBJECTIVES)
+    parser.add_argument("--width", type=int, default=200, help="width of the beam search")
+    parser.add_argument("--exact", action="store_true", help="always solve exactly (small scenarios only)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    customers = PassengerTable.random(args.floors, args.passengers, args.seed)
+
+    sim = Simulation(args.floors, customers, list(CARS.values()), load=args.load).run()
+    start = time.process_time()
+    solver = Solver(args.floors, customers, args.load, args.objective, sim.floor_time, sim.stop_time)
+    solution = solver.solve(True if args.exact else None, args.width)
+    print("%s %s: %.1f (%d stops, %d states, %.2f s CPU)" % (
+        "optimal" if solution.exact else "best found", args.objective, solution.cost, len(solution.stops),
+        solution.states, time.process_time() - start))
+    if not solution.exact:
+        print("lower bound: %.1f, the optimum is at most %.1f%% better than the best found" % (
+            solution.bound, 100 * (1 - solution.bound / solution.cost) if solution.cost else 0.0))
+    for car in sim.cars:
+        if args.objective == "cost":
+            cost = car.cost
+        else:
+            cost = sum(max(car.allcustomer.board_time[h], 0.0) for h in range(len(car.allcustomer)))
+        print("%-12s %10.1f  gap %6.1f%%" % (car.name, cost, 100 * solution.gap(cost)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Compact storage of the customers of a simulation.
+
+Every field of a customer is a column (an array of machine integers) and a customer is just
+its index in the columns (its handle). Lists of customers (waiting on a floor, inside a lift,
+delivered) are lists of handles, so millions of customers fit in a few bytes each.
+"""
+
+import random
+from array import array
+
+# directions of the lifts and of the customers (same values as the original GUI code)
+UP = 1
+DOWN = 0
+IDLE = -1
+
+
+class PassengerTable:
+    """Struct of arrays holding the ID, current floor, destination floor, direction
+        and finished flag of every customer, and the times at which they called the lift,
+        got in and got out (-1 until it happens)."""
+
+    columns = ("ID", "cur_floor", "dst_floor", "direction", "finished", "arrival_time", "board_time", "alight_time")
+
+    def __init__(self):
+
+        """Initialisation of the class. The table starts empty."""
+
+        self.ID = array("i")
+        self.cur_floor = array("i")
+        self.dst_floor = array("i")
+        self.direction = array("b")
+        self.finished = array("b")
+        self.arrival_time = array("d")
+        self.board_time = array("d")
+        self.alight_time = array("d")
+        # customers ever added, kept when the table is compacted (see keep): numbers the customers without an ID
+        self.added = 0
+
+    def __len__(self):
+        return len(self.cur_floor)
+
+    def add(self, cur_floor, dst_floor, ID=None, arrival_time=0.0):
+
+        """Adds one customer and returns its handle. The ID defaults to the number of customers added before
+            (the handle, unless the table was compacted)."""
+
+        handle = len(self.cur_floor)
+        self.ID.append(self.added if ID is None else ID)
+        self.added += 1
+        self.cur_floor.append(cur_floor)
+        self.dst_floor.append(dst_floor)
+        self.direction.append(direction_of(cur_floor, dst_floor))
+        self.finished.append(cur_floor == dst_floor)
+        self.arrival_time.append(arrival_time)
+        self.board_time.append(-1.0)
+        self.alight_time.append(-1.0)
+        return handle
+
+    def extend(self, other):
+
+        """Copies all the customers of another table (or a list of Customer objects) at the end of this one.
+            Returns the range of the new handles."""
+
+        start = len(self)
+        if isinstance(other, PassengerTable):
+            for name in self.columns:
+                getattr(self, name).extend(getattr(other, name))
+            self.added += len(other)
+        else:
+            for customer in other:
+                self.add(customer.cur_floor, customer.dst_floor, customer.ID)
+        return range(start, len(self))
+
+    def copy(self):
+        table = PassengerTable()
+        table.extend(self)
+        return table
+
+    def keep(self, handles):
+
+        """Keeps only the customers of handles (sorted), dropping the others. The customer of handles[i] gets the
+            handle i."""
+
+        for name in self.columns:
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, [column[handle] for handle in handles]))
+
+    def arrive(self, handle, floor, now=0.0):
+
+        """Marks the customer as having got out of the lift at floor at the time now."""
+
+        self.cur_floor[handle] = floor
+        self.direction[handle] = direction_of(floor, self.dst_floor[handle])
+        self.finished[handle] = floor == self.dst_floor[handle]
+        self.alight_time[handle] = now
+
+    @classmethod
+    def from_customers(cls, customers):
+        if isinstance(customers, PassengerTable):
+            return customers
+        table = cls()
+        table.extend(customers)
+        return table
+
+    @classmethod
+    def from_columns(cls, cur_floor, dst_floor, arrival_time=None):
+
+        """Builds a table from sequences (lists, arrays, numpy arrays...) of current and destination floors."""
+
+        table = cls()
+        if arrival_time is None:
+            arrival_time = [0.0] * len(cur_floor)
+        for origin, destination, time in zip(cur_floor, dst_floor, arrival_time):
+            table.add(int(origin), int(destination), arrival_time=float(time))
+        return table
+
+    @classmethod
+    def random(cls, floors, count, rng=None, spread=None):
+
+        """Table of count customers going from a random floor to another random floor, drawn with rng
+            (a random.Random, or a seed). If spread is given, they arrive at random times between 0 and spread."""
+
+        if not isinstance(rng, random.Random):
+            rng = random.Random(rng)
+        table = cls()
+        for _ in range(count):
+            if spread is None:
+                table.add(rng.randrange(floors), rng.randrange(floors))
+            else:
+                table.add(rng.randrange(floors), rng.randrange(floors), arrival_time=rng.uniform(0, spread))
+        return table
+
+
+def direction_of(cur_floor, dst_floor):
+
+    """Direction a customer has to travel to go from cur_floor to dst_floor."""
+
+    if dst_floor == cur_floor:
+        return IDLE
+    return UP if cur_floor < dst_floor else DOWN
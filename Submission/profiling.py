@@ -0,0 +1,232 @@
+"""Profiling hooks of the viewer and of the engine.
+
+The time of every phase of a frame (events, simulation, labels, update, draw, display) and of every
+decision and trip of the lifts is kept in ring buffers: a fixed number of the last values, so measuring
+costs the same whatever the length of the run and memory never grows. The viewer can show them on screen,
+and a chosen window of frames can be written as a cProfile file (.pstats, read with the pstats module or
+snakeviz) or as a Chrome trace (.json, opened in chrome://tracing or https://ui.perfetto.dev).
+
+Nothing here needs pygame: the engine can be profiled headless.
+"""
+
+import argparse
+import cProfile
+import json
+import time
+from array import array
+from functools import partial
+
+from strategies import Timer
+
+# values kept by every ring buffer (about 4 seconds of frames at 60 frames per second)
+RING_SIZE = 240
+
+
+class RingBuffer:
+    """The last size values added (the oldest ones are overwritten)."""
+
+    def __init__(self, size=RING_SIZE):
+        self.values = array("d", bytes(8 * size))
+        self.size = size
+        self.count = 0
+
+    def add(self, value):
+        self.values[self.count % self.size] = value
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    @property
+    def last(self):
+        return self.values[(self.count - 1) % self.size] if self.count else 0.0
+
+    @property
+    def mean(self):
+        n = len(self)
+        return sum(self.values[:n]) / n if n else 0.0
+
+    @property
+    def max(self):
+        n = len(self)
+        return max(self.values[:n]) if n else 0.0
+
+
+class Profiler:
+    """Timings of the phases of the frames, in ring buffers by name. A phase is timed with
+
+        start = profiler.clock()
+        ...
+        profiler.add("draw", start)
+
+    and a frame ends with end_frame(). Between the frames start and start + frames, every phase is also written to
+    a trace file (see trace)."""
+
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self.timings = {}
+        self.counters = {}
+        self.counter_names = set()
+        self.frame = 0
+        self.frame_start = time.perf_counter()
+        self.clock = time.perf_counter
+        self._trace = None
+
+    def add(self, name, start, end=None):
+
+        """Records a phase called name that started at start (a value of clock()). Returns the end of the phase,
+            which is the start of the next one."""
+
+        if end is None:
+            end = time.perf_counter()
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = RingBuffer(self.size)
+        timing.add(end - start)
+        if self._trace is not None and self._trace.events is not None:
+            self._trace.events.append({"name": name, "ph": "X", "pid": 0, "tid": 0, "ts": start * 1e6,
+                                       "dur": (end - start) * 1e6, "args": {"frame": self.frame}})
+        return end
+
+    def count(self, name, n=1):
+
+        """Adds n to the counter called name for the current frame (for example the steps of the simulation)."""
+
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def end_frame(self):
+
+        """Ends the current frame: records its duration and its counters, and starts or stops the trace."""
+
+        now = time.perf_counter()
+        self.add("frame", self.frame_start, now)
+        for name, n in self.counters.items():
+            counter = self.timings.get(name)
+            if counter is None:
+                counter = self.timings[name] = RingBuffer(self.size)
+                self.counter_names.add(name)
+            counter.add(n)
+        self.counters = {}
+        self.frame += 1
+        self.frame_start = now
+        if self._trace is not None:
+            self._trace.frame(self.frame)
+
+    def trace(self, path, start=0, frames=100):
+
+        """Writes the frames start to start + frames to path: a Chrome trace if path ends with .json,
+            a cProfile of everything run during those frames otherwise."""
+
+        self._trace = _Trace(path, start, frames)
+        self._trace.frame(self.frame)
+
+    def close(self):
+
+        """Writes the trace now if its window of frames was not over."""
+
+        if self._trace is not None:
+            self._trace.write()
+            self._trace = None
+
+    def mean(self, name):
+        timing = self.timings.get(name)
+        return timing.mean if timing is not None else 0.0
+
+    def report(self):
+
+        """Mean and max of every ring buffer, in milliseconds for the timings."""
+
+        lines = []
+        for name, timing in sorted(self.timings.items()):
+            if name in self.counter_names:
+                lines.append("%-28s mean %10.1f   max %10.1f" % (name, timing.mean, timing.max))
+            else:
+                lines.append("%-28s mean %8.3f ms max %8.3f ms" % (name, timing.mean * 1e3, timing.max * 1e3))
+        return "\n".join(lines)
+
+    def instrument(self, sim):
+
+        """Times the decisions (next_stop) and the departures (the lift leaving for its next stop) of every lift of
+            sim, by lift. Wraps the methods of the objects, so nothing is measured unless instrument is called."""
+
+        for i, car in enumerate(sim.cars):
+            car.strategy = Timer(car.strategy, partial(self.add, "next_stop %d %s" % (i, car.name)))
+        depart = sim.depart
+        names = {id(car): "depart %d %s" % (i, car.name) for i, car in enumerate(sim.cars)}
+
+        def timed_depart(car):
+            start = time.perf_counter()
+            depart(car)
+            self.add(names[id(car)], start)
+
+        sim.depart = timed_depart
+
+
+class _Trace:
+    """Window of frames written to a trace file."""
+
+    def __init__(self, path, start, frames):
+        self.path = path
+        self.start = start
+        self.end = start + frames
+        self.chrome = path.endswith(".json")
+        # events of the Chrome trace, None outside of the window
+        self.events = None
+        self.profile = None
+        self.done = False
+
+    def frame(self, frame):
+        if self.done:
+            return
+        if frame == self.start:
+            if self.chrome:
+                self.events = []
+            else:
+                self.profile = cProfile.Profile()
+                self.profile.enable()
+        elif frame >= self.end:
+            self.write()
+
+    def write(self):
+        if self.done:
+            return
+        self.done = True
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.path)
+        elif self.events is not None:
+            with open(self.path, "w") as f:
+                json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        self.events = None
+        self.profile = None
+
+
+def main():
+    from engine import CARS, Simulation
+    from passengers import PassengerTable
+
+    parser = argparse.ArgumentParser(description="Profile the engine headless: time of the decisions and departures.")
+    parser.add_argument("--floors", type=int, default=100)
+    parser.add_argument("--passengers", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cars", nargs="+", default=list(CARS), choices=list(CARS))
+    parser.add_argument("--profile", default=None, help="write a cProfile (.pstats) or Chrome trace (.json) of the run")
+    args = parser.parse_args()
+
+    customers = PassengerTable.random(args.floors, args.passengers, args.seed)
+    sim = Simulation(args.floors, customers, [CARS[name] for name in args.cars])
+    # the whole run is one frame
+    profiler = Profiler(size=1 << 16)
+    profiler.instrument(sim)
+    if args.profile:
+        profiler.trace(args.profile, 0, 1)
+    start = profiler.clock()
+    sim.run()
+    profiler.add("run", start)
+    profiler.end_frame()
+    profiler.close()
+    print(profiler.report())
+
+
+if __name__ == "__main__":
+    main()
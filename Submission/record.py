@@ -0,0 +1,164 @@
+"""Recording and replaying of scenarios, and traces of what the lifts did, in a compact binary format.
+
+A file is a small header followed by fixed-width little-endian records (RECORD, 24 bytes each):
+the time, the kind of event (the event kinds of engine.py), the lift (-1 for none), the floors and
+the passenger. A scenario is a list of CALL records (a customer at origin calls the lift to go to
+destination) sorted by time; a trace has one ARRIVE record per stop of a lift (origin is the floor)
+and one BOARD and ALIGHT record per customer getting in and out (origin is the floor of the lift).
+
+Files are written in chunks and read through numpy.memmap, one chunk at a time, and the replay runs the
+engine with reclaim (the lifts forget the customers they have delivered, their times go to the trace), so a
+scenario of 10 million customers is replayed in bounded memory: only the customers waiting or inside a lift
+are held.
+
+    python record.py write scenario.rec --floors 20 --population 800 --seed 1
+    python record.py replay scenario.rec --trace trace.rec
+    python record.py show trace.rec
+"""
+
+import argparse
+import os
+import random
+
+import numpy as np
+
+from engine import ALIGHT, ARRIVE, BOARD, CALL, CARS, Simulation
+
+MAGIC = b"LIFTREC1"
+HEADER = np.dtype([("magic", "S8"), ("floors", "<u4"), ("record_size", "<u4")])
+RECORD = np.dtype([("time", "<f8"), ("passenger", "<i4"), ("origin", "<i4"), ("destination", "<i4"),
+                   ("car", "<i2"), ("kind", "<u2")])
+# records written or read at once
+CHUNK = 1 << 16
+
+KIND_NAMES = {CALL: "call", ARRIVE: "stop", BOARD: "board", ALIGHT: "alight"}
+
+
+class RecordWriter:
+    """Writes records to a file. Records are kept in a buffer of CHUNK records and written when it is full."""
+
+    def __init__(self, path, floors):
+
+        """Initialisation of the class. The file is created (or emptied) and its header written."""
+
+        self.path = path
+        self.file = open(path, "wb")
+        header = np.zeros(1, HEADER)
+        header["magic"] = MAGIC
+        header["floors"] = floors
+        header["record_size"] = RECORD.itemsize
+        self.file.write(header.tobytes())
+        self.buffer = []
+        self.count = 0
+
+    def write(self, time, kind, origin, destination=-1, passenger=-1, car=-1):
+        self.buffer.append((time, passenger, origin, destination, car, kind))
+        self.count += 1
+        if len(self.buffer) == CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(np.array(self.buffer, RECORD).tobytes())
+            self.buffer = []
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_records(path):
+
+    """Maps the records of a file in memory without reading them. Returns (floors, records), records being a
+        read-only numpy.memmap of RECORD."""
+
+    header = np.fromfile(path, HEADER, count=1)
+    if len(header) != 1 or header["magic"][0] != MAGIC:
+        raise ValueError("%s is not a record file" % path)
+    if header["record_size"][0] != RECORD.itemsize:
+        raise ValueError("%s has records of %d bytes, expected %d" % (path, header["record_size"][0], RECORD.itemsize))
+    count = (os.path.getsize(path) - HEADER.itemsize) // RECORD.itemsize
+    if not count:
+        return int(header["floors"][0]), np.zeros(0, RECORD)
+    records = np.memmap(path, RECORD, mode="r", offset=HEADER.itemsize, shape=(count,))
+    return int(header["floors"][0]), records
+
+
+def write_scenario(path, floors, arrivals):
+
+    """Writes arrivals (an iterable of (time, cur_floor, dst_floor) sorted by time, see traffic.py) as a scenario.
+        Customers are numbered in order of arrival. Returns the number of customers."""
+
+    with RecordWriter(path, floors) as writer:
+        for passenger, (time, cur_floor, dst_floor) in enumerate(arrivals):
+            writer.write(time, CALL, cur_floor, dst_floor, passenger)
+    return writer.count
+
+
+def replay(path):
+
+    """Reads the calls of a scenario one chunk at a time, never holding more than one chunk in memory. Yields (time, cur_floor, dst_floor, ID),
+        which can be given as arrivals to engine.Simulation."""
+
+    _, records = open_records(path)
+    count = len(records)
+    del records
+    for start in range(0, count, CHUNK):
+        # every chunk is mapped on its own, so the pages already read are released
+        chunk = np.memmap(path, RECORD, mode="r", offset=HEADER.itemsize + start * RECORD.itemsize,
+                          shape=(min(CHUNK, count - start),))
+        chunk = chunk[chunk["kind"] == CALL]
+        yield from zip(chunk["time"].tolist(), chunk["origin"].tolist(), chunk["destination"].tolist(),
+                       chunk["passenger"].tolist())
+
+
+def main():
+    from traffic import office_day, piecewise_arrivals
+
+    parser = argparse.ArgumentParser(description="Write, replay and show scenario and trace files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    write = commands.add_parser("write", help="write an office day scenario")
+    write.add_argument("path")
+    write.add_argument("--floors", type=int, default=20)
+    write.add_argument("--population", type=int, default=800)
+    write.add_argument("--seed", type=int, default=None)
+    play = commands.add_parser("replay", help="run a scenario through the engine")
+    play.add_argument("path")
+    play.add_argument("--cars", nargs="+", default=list(CARS), choices=list(CARS))
+    play.add_argument("--load", type=int, default=10)
+    play.add_argument("--trace", default=None, help="write the stops, boardings and alightings to this file")
+    show = commands.add_parser("show", help="print the records of a file")
+    show.add_argument("path")
+    show.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "write":
+        arrivals = piecewise_arrivals(office_day(args.floors, args.population), random.Random(args.seed))
+        print("%d customers written to %s" % (write_scenario(args.path, args.floors, arrivals), args.path))
+    elif args.command == "replay":
+        floors, _ = open_records(args.path)
+        trace = RecordWriter(args.trace, floors) if args.trace else None
+        sim = Simulation(floors, (), [CARS[name] for name in args.cars], load=args.load, arrivals=replay(args.path),
+                         trace=trace, reclaim=True).run()
+        if trace is not None:
+            trace.close()
+        for car in sim.cars:
+            print(car.name, "cost:", car.cost, "stops:", car.floor_count, "finished:", car.finished_customer)
+    else:
+        floors, records = open_records(args.path)
+        print("%d floors, %d records" % (floors, len(records)))
+        for record in records[:args.limit]:
+            print("%12.3f %-6s car %3d floor %4d -> %4d passenger %d" % (
+                record["time"], KIND_NAMES.get(int(record["kind"]), record["kind"]), record["car"], record["origin"],
+                record["destination"], record["passenger"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Recording of the viewer to a PNG sequence or a video stream, in a background thread.
+
+The main loop only copies every frame into a free surface of a small pool (one blit, no allocation) and hands it
+to a writer thread over a bounded queue. The writer converts the pixels and encodes them (zlib and numpy do
+the heavy work and let the main loop run meanwhile), then gives the surface back to the pool. When the writer
+is behind and the pool is empty, the live viewer drops the frame instead of waiting, so recording never slows it
+down; the headless recorder waits instead, so that no frame of the video is lost.
+
+The format is picked from the path (any other path is refused):
+
+    frames/ or frames/%05d.png    PNG sequence
+    run.y4m                       YUV4MPEG2 stream (4:2:0), played by mpv or vlc, converted by ffmpeg -i run.y4m run.mp4
+    run.rgb                       raw rgb24 frames, ffmpeg -f rawvideo -pix_fmt rgb24 -s 640x480 -r 30 -i run.rgb
+
+The headless recorder renders the viewer off-screen (dummy SDL video driver) at a chosen frame rate, frame n
+showing the simulation at the time n / fps * speed, so the video does not depend on how fast the machine is:
+
+    python recorder.py run.y4m --fps 30 --speed 10 --seed 1
+    python recorder.py frames/ --fps 10 --speed 60 --seconds 120 scenario.rec
+"""
+
+import argparse
+import os
+import queue
+import random
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from engine import CARS
+
+# frames waiting for the writer (and surfaces in the pool)
+QUEUE_SIZE = 8
+# zlib level of the PNG files: fast rather than small
+PNG_LEVEL = 3
+
+
+class FrameWriter:
+    """Writes the frames given to put in a background thread."""
+
+    def __init__(self, path, fps=30, queue_size=QUEUE_SIZE, block=False):
+
+        """Initialisation of the class. block tells what put does when the writer is behind: wait for it (True)
+            or drop the frame (False)."""
+
+        self.path = path
+        self.fps = fps
+        self.block = block
+        self.size = None
+        self.count = 0
+        self.dropped = 0
+        self.error = None
+        # surfaces free to copy a frame into, and frames waiting to be written
+        self.free = queue.Queue(queue_size)
+        self.frames = queue.Queue(queue_size)
+        self.queue_size = queue_size
+        self.file = None
+        self.pattern = None
+        self.format = format_of(path)
+        if self.format == "png":
+            self.pattern = path if "%" in path else os.path.join(path, "frame_%06d.png")
+        directory = os.path.dirname(self.pattern or path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, name="frame writer", daemon=True)
+        self.thread.start()
+
+    def put(self, surface):
+
+        """Copies surface (the screen) and queues it for the writer. Returns False if the frame was dropped.
+            The first frame sets the size of the video: later frames of another size are cropped or padded."""
+
+        if self.error is not None:
+            raise self.error
+        if self.size is None:
+            # the pool has the size and pixel format of the screen, so copying a frame is a plain memory copy
+            self.size = surface.get_size()
+            for _ in range(self.queue_size):
+                self.free.put(surface.copy())
+        try:
+            frame = self.free.get(self.block)
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        if frame is None:
+            raise self.error
+        if surface.get_size() != self.size:
+            frame.fill((255, 255, 255))
+        frame.blit(surface, (0, 0))
+        self.frames.put(frame)
+        return True
+
+    def close(self):
+
+        """Writes the frames still queued and waits for the writer to finish."""
+
+        if self.thread.is_alive():
+            self.frames.put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        try:
+            while True:
+                frame = self.frames.get()
+                if frame is None:
+                    break
+                rgb = _rgb(frame)
+                self.free.put(frame)
+                self.write(rgb)
+                self.count += 1
+        except Exception as error:
+            self.error = error
+            # the main loop must not wait for a writer that is gone
+            while True:
+                try:
+                    self.free.put_nowait(None)
+                except queue.Full:
+                    break
+        finally:
+            if self.file is not None:
+                self.file.close()
+
+    def write(self, rgb):
+
+        """Encodes one frame, an array of shape (height, width, 3)."""
+
+        if self.format == "png":
+            with open(self.pattern % self.count, "wb") as f:
+                f.write(png(rgb))
+            return
+        if self.file is None:
+            self.file = open(self.path, "wb")
+            if self.format == "y4m":
+                height, width = rgb.shape[0] & ~1, rgb.shape[1] & ~1
+                self.file.write(b"YUV4MPEG2 W%d H%d F%d:1 Ip A1:1 C420jpeg\n" % (width, height, self.fps))
+        if self.format == "y4m":
+            self.file.write(b"FRAME\n")
+            self.file.write(yuv420(rgb))
+        else:
+            self.file.write(rgb.tobytes())
+
+
+def format_of(path):
+
+    """Format of the frames written to path: "y4m", "rgb", or "png" for a directory (a path ending with a slash or
+        without an extension) or a %d pattern ending with .png. Raises ValueError for any other path."""
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".y4m":
+        return "y4m"
+    if extension in (".rgb", ".raw"):
+        return "rgb"
+    if path.endswith(os.sep) or not extension or "%" in path and extension == ".png":
+        return "png"
+    raise ValueError("cannot record to %s: give a directory or a %%d pattern ending with .png for PNG files, "
+                     "or a .y4m or .rgb file" % path)
+
+
+def _rgb(surface):
+
+    """Pixels of a surface as a contiguous (height, width, 3) array of bytes."""
+
+    import pygame
+
+    pixels = pygame.surfarray.pixels3d(surface)
+    rgb = np.ascontiguousarray(pixels.transpose(1, 0, 2))
+    del pixels  # unlocks the surface
+    return rgb
+
+
+def png(rgb, level=PNG_LEVEL):
+
+    """PNG file of an RGB image (an array of shape (height, width, 3))."""
+
+    height, width = rgb.shape[:2]
+    # every row starts with its filter type (0: none)
+    rows = np.zeros((height, width * 3 + 1), np.uint8)
+    rows[:, 1:] = rgb.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), level)) + chunk(b"IEND", b""))
+
+
+def yuv420(rgb):
+
+    """Planes Y, Cb and Cr (full range, Cb and Cr at half the resolution) of an RGB image, as bytes.
+        An odd last row or column is dropped."""
+
+    height, width = rgb.shape[0] & ~1, rgb.shape[1] & ~1
+    rgb = rgb[:height, :width].astype(np.int32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    y = (77 * r + 150 * g + 29 * b + 128) >> 8
+    # chroma of the mean of every block of 2 x 2 pixels
+    r = (r[0::2, 0::2] + r[1::2, 0::2] + r[0::2, 1::2] + r[1::2, 1::2]) >> 2
+    g = (g[0::2, 0::2] + g[1::2, 0::2] + g[0::2, 1::2] + g[1::2, 1::2]) >> 2
+    b = (b[0::2, 0::2] + b[1::2, 0::2] + b[0::2, 1::2] + b[1::2, 1::2]) >> 2
+    cb = ((-43 * r - 85 * g + 128 * b + 128) >> 8) + 128
+    cr = ((128 * r - 107 * g - 21 * b + 128) >> 8) + 128
+    return b"".join(np.clip(plane, 0, 255).astype(np.uint8).tobytes() for plane in (y, cb, cr))
+
+
+def record(path, fps=30, speed=10.0, seconds=None, scenario=None, seed=None, size=(640, 480),
+           queue_size=QUEUE_SIZE, cars=("MechaCar", "MyCar")):
+
+    """Renders the viewer off-screen and records it to path, fps frames per second of video and speed seconds of
+        simulation per second of video. Records seconds of video, or until the lifts have delivered everyone
+        (and one more second) if seconds is None. cars are the names (in engine.CARS) of the two lifts shown.
+        Returns the FrameWriter, with its counts of frames."""
+
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    import pygame
+
+    import main as viewer
+    from engine import Customer, Simulation
+    from motion import Kinematic
+
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+    floors = 20
+    customers = []
+    arrivals = None
+    if scenario:
+        from record import open_records, replay
+        floors = open_records(scenario)[0]
+        arrivals = replay(scenario)
+    else:
+        rng = random.Random(seed)
+        customers = [Customer(floors, rng=rng) for _ in range(10)]
+    sim = Simulation(floors, customers, [CARS[name] for name in cars], motion=Kinematic(), arrivals=arrivals)
+
+    viewport = viewer.Viewport(floors, 10, screen.get_height() - 10)
+    time_label = viewer.Label("", 20, (0, 0, 0), (10, 10), "topleft")
+    elevators, sprites = viewer.make_scene(screen, sim, viewport, time_label)
+    writer = FrameWriter(path, fps, queue_size, block=True)
+    frames = int(seconds * fps) if seconds is not None else None
+    end = None
+    frame = 0
+    try:
+        while frames is None or frame < frames:
+            sim.run(until=frame / fps * speed)
+            if frames is None and sim.done:
+                # one more second of video once everyone is delivered
+                end = frame + fps if end is None else end
+                if frame >= end:
+                    break
+            for elevator in elevators:
+                elevator.update_labels()
+            time_label.set_text("Time: %.1f s (%gx)" % (sim.now, speed))
+            sprites.update(sim.now)
+            sprites.draw(screen)
+            writer.put(screen)
+            frame += 1
+    finally:
+        writer.close()
+    return writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record the viewer headless to a PNG sequence or a video stream.")
+    parser.add_argument("path", help="directory or %%d pattern for PNG files, or a .y4m or .rgb file")
+    parser.add_argument("scenario", nargs="?", default=None, help="scenario file written by record.py to replay")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--speed", type=float, default=10.0, help="seconds of simulation per second of video")
+    parser.add_argument("--seconds", type=float, default=None, help="length of the video (default: until everyone "
+                                                                     "is delivered)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cars", nargs=2, default=["MechaCar", "MyCar"], choices=list(CARS),
+                        help="the two lifts shown, left and right")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+    try:
+        format_of(args.path)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    writer = record(args.path, args.fps, args.speed, args.seconds, args.scenario, args.seed, (args.width, args.height),
+                    cars=args.cars)
+    elapsed = time.perf_counter() - start
+    print("%d frames (%.1f s of video) written to %s in %.1f s, %.0f frames per second" % (
+        writer.count, writer.count / args.fps, args.path, elapsed, writer.count / elapsed if elapsed else 0))
+
+
+if __name__ == "__main__":
+    main()
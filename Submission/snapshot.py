@@ -0,0 +1,302 @@
+"""Snapshots of a running simulation, to resume it later or to fork it into what-if runs.
+
+A snapshot is the whole state of an engine.Simulation (or group.GroupSimulation) at the time of an event: the
+clock, the queue of events, and for every lift its position, doors, direction, counters and customers
+(the columns of its PassengerTable and the handles waiting on every floor or inside the lift), plus the calls
+not dispatched yet in a group. Lifts are saved by index and customers by handle, so a snapshot is made of
+plain numbers and arrays and is pickled in a few bytes per customer.
+
+Arrivals are read from an iterator that cannot be saved: the snapshot keeps how many were read, and the
+same source of arrivals given again on restore is skipped to that point. Metrics and traces are not saved,
+new ones can be given on restore.
+
+From one snapshot taken in the middle of a rush, fork runs the rest of the day once per lift strategy or
+dispatcher in a pool of processes, so the common start of the day is only simulated once:
+
+    python snapshot.py --floors 20 --cars 4 --population 800 --seed 1 --at 3600 --out rush.snap
+    python snapshot.py --floors 20 --cars 4 --population 800 --seed 1 --snapshot rush.snap \\
+        --strategies MyCar MechaCar NearestCar --dispatchers eta nearest destination
+"""
+
+import argparse
+import itertools
+import pickle
+import random
+import time
+import zlib
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from engine import CARS, Simulation
+from group import DISPATCHERS, GroupSimulation
+from strategies import STRATEGIES
+
+# version of the layout of the snapshots, checked on restore
+VERSION = 3
+
+# attributes of a lift saved as they are
+CAR_FIELDS = ("num_of_floors", "cur_floor", "direction", "floor_count", "cost", "state", "overload", "load",
+              "delivered", "finished_customer", "reclaimed", "next_floor", "dep_floor", "dep_time", "arr_time")
+
+
+def take(sim):
+
+    """Returns a snapshot of sim (a dict of numbers and arrays). The simulation is not changed and can go on."""
+
+    index = {id(car): i for i, car in enumerate(sim.cars)}
+    state = {
+        "version": VERSION,
+        "floors": sim.num_of_floors,
+        "motion": sim.motion,
+        "door_time": sim.door_time,
+        "dwell_time": sim.dwell_time,
+        "reclaim": sim.reclaim,
+        "now": sim.now,
+        "seq": sim._seq,
+        "handled": sim.handled,
+        "events": [(time, seq, kind, -1 if car is None else index[id(car)]) for time, seq, kind, car in sim.events],
+        "arrival_count": sim.arrival_count,
+        "arrival": getattr(sim, "_arrival", None),
+        "arrivals_done": sim.arrivals is None,
+        "cars": [_take_car(car) for car in sim.cars],
+        "dispatcher": None,
+    }
+    dispatcher = getattr(sim, "dispatcher", None)
+    if dispatcher is not None:
+        state["dispatcher"] = {
+            "name": _name_of(DISPATCHERS, type(dispatcher)),
+            "pending": {button: list(calls) for button, calls in dispatcher.pending.items()},
+            "assigned": {button: index[id(car)] for button, car in dispatcher.assigned.items()},
+        }
+    return state
+
+
+def _take_car(car):
+    customers = car.allcustomer
+    waiting = array("i")
+    sizes = array("i")
+    for queues in car.floor_list:
+        for queue in queues:
+            waiting.extend(queue)
+            sizes.append(len(queue))
+    state = {name: getattr(car, name) for name in CAR_FIELDS}
+    state.update({
+        "class": type(car).__name__,
+        "strategy": _strategy_name(car.strategy),
+        "customers": {name: getattr(customers, name)[:] for name in customers.columns},
+        "added": customers.added,
+        "inside": array("i", car.elevator_customer),
+        "waiting": waiting,
+        "queue_sizes": sizes,
+    })
+    return state
+
+
+def _strategy_name(strategy):
+
+    """Name of a strategy in strategies.STRATEGIES, under the wrappers timing it (strategies.Timer)."""
+
+    while hasattr(strategy, "strategy"):
+        strategy = strategy.strategy
+    return strategy.name
+
+
+def _name_of(table, value):
+    for name, item in table.items():
+        if item is value:
+            return name
+    raise ValueError("%r is not registered" % value)
+
+
+def restore(state, arrivals=None, strategy=None, dispatcher=None, metrics=None, trace=None):
+
+    """Builds a simulation from a snapshot, ready to run from the time it was taken.
+        arrivals is the same source of arrivals the simulation was started with (all of it: the customers
+        read before the snapshot are skipped). strategy (a name in strategies.STRATEGIES) replaces the
+        strategy of every lift and dispatcher (a name in group.DISPATCHERS) the dispatcher of a group,
+        to see what they would have done from there. metrics and trace are given to the simulation as usual."""
+
+    if state.get("version") != VERSION:
+        raise ValueError("snapshot of version %s, expected %d" % (state.get("version"), VERSION))
+    cars = [CARS[car["class"]] for car in state["cars"]]
+    options = dict(motion=state["motion"], door_time=state["door_time"], dwell_time=state["dwell_time"],
+                   reclaim=state["reclaim"], load=state["cars"][0]["load"] if cars else 10, metrics=metrics, trace=trace)
+    group = state["dispatcher"]
+    if group is not None:
+        sim = GroupSimulation(state["floors"], (), cars, dispatcher=DISPATCHERS[dispatcher or group["name"]],
+                              **options)
+        sim.dispatcher.pending = {button: list(calls) for button, calls in group["pending"].items()}
+        sim.dispatcher.assigned = {button: sim.cars[i] for button, i in group["assigned"].items()}
+    else:
+        sim = Simulation(state["floors"], (), cars, **options)
+
+    for car, car_state in zip(sim.cars, state["cars"]):
+        _restore_car(car, car_state)
+        if strategy is not None:
+            car.strategy = STRATEGIES[strategy]()
+        elif car_state["strategy"] != car.strategy.name:
+            car.strategy = STRATEGIES[car_state["strategy"]]()
+
+    sim.now = state["now"]
+    sim._seq = state["seq"]
+    sim.handled = state["handled"]
+    sim.events = [(time, seq, kind, None if i < 0 else sim.cars[i]) for time, seq, kind, i in state["events"]]
+    sim.arrival_count = state["arrival_count"]
+    if state["arrival"] is not None:
+        sim._arrival = state["arrival"]
+    if state["arrivals_done"]:
+        sim.arrivals = None
+    else:
+        if arrivals is None:
+            raise ValueError("the snapshot was taken before the end of the arrivals: give them again to restore it")
+        sim.arrivals = itertools.islice(arrivals, state["arrival_count"], None)
+    return sim
+
+
+def _restore_car(car, state):
+    for name in CAR_FIELDS:
+        setattr(car, name, state[name])
+    customers = car.allcustomer
+    for name in customers.columns:
+        getattr(customers, name).extend(state["customers"][name])
+    customers.added = state["added"]
+    car.elevator_customer = list(state["inside"])
+
+    # queues of the floors, and the call indexes counted from them
+    car.calls.clear()
+    waiting = state["waiting"]
+    sizes = state["queue_sizes"]
+    start = 0
+    for i, size in enumerate(sizes):
+        floor, direction = divmod(i, 2)
+        car.floor_list[floor][direction] = deque(waiting[start:start + size])
+        start += size
+        for _ in range(size):
+            car.calls.hall[direction].add(floor)
+    for handle in car.elevator_customer:
+        car.calls.car.add(customers.dst_floor[handle])
+
+
+def dumps(state):
+
+    """Snapshot as compressed bytes."""
+
+    return zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL), 1)
+
+
+def loads(data):
+    return pickle.loads(zlib.decompress(data))
+
+
+def save(state, path):
+    with open(path, "wb") as f:
+        f.write(dumps(state))
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def summary(sim):
+
+    """Cost, stops, delivered customers and mean wait of all the lifts of a simulation."""
+
+    waits = []
+    for car in sim.cars:
+        customers = car.allcustomer
+        waits.extend(customers.board_time[h] - customers.arrival_time[h] for h in range(len(customers))
+                     if customers.board_time[h] >= 0)
+    return {"cost": sum(car.cost for car in sim.cars), "stops": sum(car.floor_count for car in sim.cars),
+            "finished": sum(car.finished_customer for car in sim.cars), "mean_wait": sum(waits) / max(len(waits), 1),
+            "max_wait": max(waits, default=0.0), "end": sim.now}
+
+
+def run_variant(data, arrivals, strategy=None, dispatcher=None, until=None):
+
+    """Restores a snapshot (as bytes) and runs it (in a worker process). arrivals is a function returning the
+        arrivals of the whole run, or None. Returns the summary of the run and the CPU time it took."""
+
+    start = time.process_time()
+    sim = restore(loads(data), arrivals() if arrivals is not None else None, strategy, dispatcher)
+    sim.run(until)
+    result = summary(sim)
+    result["cpu_time"] = time.process_time() - start
+    return result
+
+
+def fork(state, variants, arrivals=None, until=None, workers=None):
+
+    """Runs the rest of the simulation of a snapshot once for every variant, a (strategy, dispatcher) pair
+        (None keeps the one of the snapshot), in a pool of processes. arrivals is a function returning the
+        arrivals of the whole run (it is called in every worker, so it has to be picklable, for example
+        functools.partial(record.replay, path)). Returns the results in the order of the variants."""
+
+    data = dumps(state)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_variant, data, arrivals, strategy, dispatcher, until)
+                   for strategy, dispatcher in variants]
+        return [future.result() for future in futures]
+
+
+def office_arrivals(floors, population, seed):
+
+    """Arrivals of an office day (see traffic.py), the same ones every time for a seed."""
+
+    from traffic import office_day, piecewise_arrivals
+
+    return piecewise_arrivals(office_day(floors, population), random.Random(seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot an office day in the middle of a rush and fork the rest "
+                                                 "of it with other strategies and dispatchers.")
+    parser.add_argument("--floors", type=int, default=20)
+    parser.add_argument("--cars", type=int, default=4)
+    parser.add_argument("--algorithm", default="MyCar", choices=list(CARS))
+    parser.add_argument("--dispatcher", default="eta", choices=list(DISPATCHERS))
+    parser.add_argument("--population", type=int, default=800)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--at", type=float, default=3600.0, help="time of the snapshot, in seconds from 7:00")
+    parser.add_argument("--out", default=None, help="save the snapshot to this file")
+    parser.add_argument("--snapshot", default=None, help="start from this snapshot instead of simulating up to --at")
+    parser.add_argument("--strategies", nargs="+", default=[None], choices=list(STRATEGIES))
+    parser.add_argument("--dispatchers", nargs="+", default=[None], choices=list(DISPATCHERS))
+    parser.add_argument("--until", type=float, default=None, help="stop the forks at this time")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: all cores)")
+    args = parser.parse_args()
+
+    arrivals = partial(office_arrivals, args.floors, args.population, args.seed)
+    start = time.process_time()
+    if args.snapshot:
+        state = load(args.snapshot)
+    else:
+        sim = GroupSimulation(args.floors, (), (CARS[args.algorithm],) * args.cars,
+                              dispatcher=DISPATCHERS[args.dispatcher], arrivals=arrivals())
+        sim.run(args.at)
+        state = take(sim)
+    prefix = time.process_time() - start
+    size = len(dumps(state))
+    print("snapshot at %.0f s: %d customers, %d events, %d bytes, %.2f s to get there" % (
+        state["now"], state["arrival_count"], len(state["events"]), size, prefix))
+    if args.out:
+        save(state, args.out)
+
+    variants = list(itertools.product(args.strategies, args.dispatchers))
+    if variants == [(None, None)] and args.out:
+        return
+    results = fork(state, variants, arrivals, args.until, args.workers)
+    print("%-12s %-12s %8s %8s %9s %10s %10s %9s" % ("strategy", "dispatcher", "cost", "stops", "finished",
+                                                     "mean wait", "max wait", "cpu s"))
+    for (strategy, dispatcher), result in zip(variants, results):
+        print("%-12s %-12s %8d %8d %9d %10.1f %10.1f %9.2f" % (
+            strategy or "(same)", dispatcher or "(same)", result["cost"], result["stops"], result["finished"],
+            result["mean_wait"], result["max_wait"], result["cpu_time"]))
+    if len(variants) > 1:
+        print("the first %.0f s were simulated once instead of %d times" % (state["now"], len(variants)))
+
+
+if __name__ == "__main__":
+    main()
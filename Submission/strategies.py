@@ -0,0 +1,275 @@
+"""Strategies deciding where a lift stops next.
+
+A strategy only looks at the state of one lift (its floor, direction, load and call indexes, see calls.py)
+and returns the next floor to stop at, or None when there is nothing left to do. It may change the direction
+of the lift. Strategies are registered by name in STRATEGIES, and registering one also adds a lift class driven
+by it to CARS (engine.CARS is the same dict), even after engine was imported. A new strategy can then be picked
+by name in the simulations, the sweeps and the viewer (main.py --cars):
+
+    @register
+    class MyStrategy(Strategy):
+        name = "MyStrategyCar"
+
+        def next_stop(self, car):
+            ...
+
+Every strategy can be timed on its own decisions:
+
+    python strategies.py --floors 20 --passengers 1000 --seed 1
+"""
+
+import argparse
+import time
+
+from metrics import Histogram
+from passengers import DOWN, IDLE, UP
+
+# strategies by name
+STRATEGIES = {}
+# lift classes by name, one for every strategy (see engine.CARS)
+CARS = {}
+# function building the lift class of a strategy, set by engine (which needs this module first)
+car_class = None
+
+
+def register(strategy_class):
+
+    """Class decorator adding a strategy to STRATEGIES under its name, and a lift class driven by it to CARS."""
+
+    STRATEGIES[strategy_class.name] = strategy_class
+    if car_class is not None:
+        add_car(strategy_class)
+    return strategy_class
+
+
+def add_car(strategy_class):
+
+    """Adds the lift class of a strategy to CARS, unless the lift of that name already uses it."""
+
+    car = CARS.get(strategy_class.name)
+    if car is None or type(car.strategy) is not strategy_class:
+        CARS[strategy_class.name] = car_class(strategy_class)
+
+
+class Strategy:
+    """Base class of the strategies."""
+
+    name = None
+
+    def next_stop(self, car):
+
+        """Returns the next floor the lift will stop at (its current floor if customers get in now), or None."""
+
+        raise NotImplementedError
+
+    def turn(self, car, start, floor, low, high):
+
+        """Floors where a lift leaving from start turns around, and turns around again, before it can pick up
+            a customer at floor who is behind it or going the other way. low and high are the lowest and the
+            highest calls of the lift. Used by Car.estimate; by default the lift turns at its last call."""
+
+        if car.direction == UP:
+            return max(high, start, floor), min(low, floor)
+        return min(low, start, floor), max(high, floor)
+
+
+def survey(car):
+
+    """Looks at the calls around the lift. Returns (here, same, up, down): here is True if customers at
+        the current floor can get in in the direction of the lift, same the direction of customers waiting at
+        the current floor otherwise (None if there are none), up and down the closest calls above and below.
+        A full lift ignores the hall calls."""
+
+    calls = car.calls
+    hall = not car.overload
+    same = None
+    if hall:
+        if car.direction != IDLE and car.cur_floor in calls.hall[car.direction]:
+            return True, None, None, None
+        if car.cur_floor in calls.hall[UP]:
+            same = UP
+        elif car.cur_floor in calls.hall[DOWN]:
+            same = DOWN
+    return False, same, calls.above(car.cur_floor, hall), calls.below(car.cur_floor, hall)
+
+
+def closest(car, up, down):
+
+    """Direction of the closest of the calls up and down (up if they are as close)."""
+
+    if down is None or (up is not None and up - car.cur_floor <= car.cur_floor - down):
+        return UP
+    return DOWN
+
+
+def reverse(direction):
+    return UP if direction == DOWN else DOWN
+
+
+@register
+class Look(Strategy):
+    """My lift (LOOK): never changes direction until it has finished all the tasks in the same direction."""
+
+    name = "MyCar"
+
+    def next_stop(self, car):
+        here, same, up, down = survey(car)
+        if here:
+            return car.cur_floor
+
+        # the lift was waiting: go to the closest call
+        if car.direction == IDLE:
+            if same is not None:
+                car.direction = same
+                return car.cur_floor
+            if up is None and down is None:
+                return None
+            car.direction = closest(car, up, down)
+
+        ahead, behind = (up, down) if car.direction == UP else (down, up)
+        if ahead is not None:
+            return ahead
+        # change of direction, first for the customers waiting here
+        if same is not None:
+            car.direction = same
+            return car.cur_floor
+        if behind is not None:
+            car.direction = reverse(car.direction)
+            return behind
+        car.direction = IDLE
+        return None
+
+
+@register
+class Scan(Strategy):
+    """The mechanical lift (SCAN): never changes direction until it has reached the bottom or the top."""
+
+    name = "MechaCar"
+
+    def next_stop(self, car):
+        top = car.num_of_floors - 1
+        # only changes direction at the endpoints
+        if car.cur_floor == top:
+            car.direction = DOWN
+        elif car.cur_floor == 0:
+            car.direction = UP
+
+        here, same, up, down = survey(car)
+        if here:
+            return car.cur_floor
+
+        if car.direction == IDLE:
+            if same is not None:
+                car.direction = same
+                return car.cur_floor
+            if up is None and down is None:
+                return None
+            car.direction = closest(car, up, down)
+
+        ahead, behind = (up, down) if car.direction == UP else (down, up)
+        if ahead is not None:
+            return ahead
+        # has to go to the end before serving people going the other way
+        if behind is not None or same is not None:
+            return top if car.direction == UP else 0
+        car.direction = IDLE
+        return None
+
+    def turn(self, car, start, floor, low, high):
+        top = car.num_of_floors - 1
+        return (top, 0) if car.direction == UP else (0, top)
+
+
+@register
+class Nearest(Strategy):
+    """Nearest call first (shortest seek): always goes to the closest call, whatever its direction.
+        Short trips, but customers at the ends of the building can wait for a long time."""
+
+    name = "NearestCar"
+
+    def next_stop(self, car):
+        here, same, up, down = survey(car)
+        if here:
+            return car.cur_floor
+        if same is not None:
+            car.direction = same
+            return car.cur_floor
+        if up is None and down is None:
+            car.direction = IDLE
+            return None
+        car.direction = closest(car, up, down)
+        return up if car.direction == UP else down
+
+
+@register
+class LookHome(Look):
+    """LOOK lift going back to a home floor (the lobby) when it has nothing to do, ready for the next
+        customers of the morning peak."""
+
+    name = "LookHomeCar"
+    home = 0
+
+    def next_stop(self, car):
+        target = super().next_stop(car)
+        if target is None and car.cur_floor != self.home and not car.calls.mask():
+            car.direction = UP if self.home > car.cur_floor else DOWN
+            return self.home
+        return target
+
+
+class Timer:
+    """Wraps the strategy of a lift and times every decision. sink is called with the start and the end
+    (values of time.perf_counter) of every decision; by default the durations go to latency, in microseconds."""
+
+    def __init__(self, strategy, sink=None):
+        self.strategy = strategy
+        self.name = strategy.name
+        self.latency = Histogram()
+        self.sink = self.record if sink is None else sink
+
+    def record(self, start, end):
+        self.latency.add((end - start) * 1e6)
+
+    def next_stop(self, car):
+        start = time.perf_counter()
+        target = self.strategy.next_stop(car)
+        self.sink(start, time.perf_counter())
+        return target
+
+    def turn(self, car, start, floor, low, high):
+        return self.strategy.turn(car, start, floor, low, high)
+
+
+def main():
+    from engine import CARS, Simulation
+    from passengers import PassengerTable
+
+    parser = argparse.ArgumentParser(description="Time the decisions of every strategy on the same customers.")
+    parser.add_argument("--floors", type=int, default=20)
+    parser.add_argument("--passengers", type=int, default=1000)
+    parser.add_argument("--load", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    args = parser.parse_args()
+
+    customers = PassengerTable.random(args.floors, args.passengers, args.seed, spread=args.passengers)
+    arrivals = sorted(zip(customers.arrival_time, customers.cur_floor, customers.dst_floor))
+
+    print("%-12s %10s %8s %10s %10s %10s %10s" % ("strategy", "decisions", "cost", "mean wait", "mean us", "p50 us",
+                                                  "p99 us"))
+    for name in args.strategies:
+        sim = Simulation(args.floors, (), (CARS[name],), load=args.load, arrivals=arrivals)
+        car = sim.cars[0]
+        car.strategy = timer = Timer(car.strategy)
+        sim.run()
+        customers = car.allcustomer
+        waits = [customers.board_time[h] - customers.arrival_time[h] for h in range(len(customers))
+                 if customers.board_time[h] >= 0]
+        latency = timer.latency
+        print("%-12s %10d %8d %10.1f %10.2f %10.2f %10.2f" % (
+            name, latency.count, car.cost, sum(waits) / max(len(waits), 1), latency.mean or 0.0,
+            latency.percentile(50) or 0.0, latency.percentile(99) or 0.0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Parameter sweep over building height, number of customers, lift capacity and algorithm.
+
+Every cell of the grid is a batch of Monte Carlo scenarios (see batch.py). The cells run in a pool of
+processes and every result row is written to the output file (.jsonl or .csv) as soon as it is ready.
+Running the same command again resumes an interrupted sweep: the cells already in the output file are
+skipped. Seeds only depend on the base seed and on the building, so all algorithms of a cell of the grid
+see exactly the same scenarios and a sweep gives the same numbers whatever the number of workers.
+
+    python sweep.py --floors 10 20 50 --passengers 10 100 --load 5 10 --scenarios 500 --out sweep.jsonl
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from batch import per_scenario, run_batch, summarize
+from engine import CARS
+
+COLUMNS = ["key", "floors", "passengers", "load", "algorithm", "scenarios", "seed"] + [
+    metric + "_" + stat
+    for metric in ("cost", "floor_count", "wait", "ride")
+    for stat in ("mean", "ci_low", "ci_high", "p95")
+] + ["cpu_time"]
+
+
+def cell_seed(base_seed, floors, passengers, load):
+
+    """Deterministic seed of a cell of the grid, the same for every algorithm."""
+
+    return int(np.random.SeedSequence([base_seed, floors, passengers, load]).generate_state(1)[0])
+
+
+def make_cells(floors, passengers, loads, algorithms, scenarios, base_seed):
+
+    """Returns the list of all the cells of the grid (one dict per cell)."""
+
+    cells = []
+    for floor, passenger, load, algorithm in itertools.product(floors, passengers, loads, algorithms):
+        cells.append({
+            "key": "%d-%d-%d-%s-%d-%d" % (floor, passenger, load, algorithm, scenarios, base_seed),
+            "floors": floor,
+            "passengers": passenger,
+            "load": load,
+            "algorithm": algorithm,
+            "scenarios": scenarios,
+            "seed": cell_seed(base_seed, floor, passenger, load),
+        })
+    return cells
+
+
+def run_cell(cell):
+
+    """Runs one cell of the grid (in a worker process) and returns its result row."""
+
+    start = time.process_time()
+    results = run_batch(cell["scenarios"], cell["floors"], cell["passengers"], cell["load"], cell["seed"],
+                        cars=(CARS[cell["algorithm"]],))
+    result = results[cell["algorithm"]]
+    row = dict(cell)
+    for metric in ("cost", "floor_count", "wait", "ride"):
+        stats = summarize(per_scenario(result, metric))
+        pooled = summarize(result[metric].ravel())
+        for stat in ("mean", "ci_low", "ci_high"):
+            row[metric + "_" + stat] = _number(stats.get(stat))
+        row[metric + "_p95"] = _number(pooled.get("p95"))
+    row["cpu_time"] = time.process_time() - start
+    return row
+
+
+def _number(value):
+    if value is None or np.isnan(value):
+        return None
+    return float(value)
+
+
+def finished_keys(path):
+
+    """Keys of the cells already in the output file. Incomplete rows (interrupted writes) are ignored."""
+
+    if not os.path.exists(path):
+        return set()
+    keys = set()
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                if None not in row and None not in row.values():
+                    keys.add(row["key"])
+        else:
+            for line in f:
+                try:
+                    keys.add(json.loads(line)["key"])
+                except (ValueError, KeyError):
+                    pass
+    return keys
+
+
+class ResultSink:
+    """Appends result rows to a .jsonl or .csv file, flushing every row so that nothing is lost on interruption."""
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = path.endswith(".csv")
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        if not new:
+            # an interrupted write can leave a line without its end
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.file.write("\n")
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, COLUMNS)
+            if new:
+                self.writer.writeheader()
+
+    def write(self, row):
+        if self.csv:
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def sweep(cells, out, workers=None):
+
+    """Runs the cells that are not in out yet over a pool of workers, writing every row as it completes.
+        Returns the number of cells run."""
+
+    done = finished_keys(out)
+    todo = [cell for cell in cells if cell["key"] not in done]
+    sink = ResultSink(out)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_cell, cell) for cell in todo]
+            for future in as_completed(futures):
+                sink.write(future.result())
+    finally:
+        sink.close()
+    return len(todo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the simulation over a grid of parameters.")
+    parser.add_argument("--floors", type=int, nargs="+", default=[20])
+    parser.add_argument("--passengers", type=int, nargs="+", default=[10])
+    parser.add_argument("--load", type=int, nargs="+", default=[10])
+    parser.add_argument("--algorithms", nargs="+", default=list(CARS), choices=list(CARS))
+    parser.add_argument("--scenarios", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument("--out", default="sweep.jsonl", help="output file, .jsonl or .csv")
+    args = parser.parse_args()
+
+    cells = make_cells(args.floors, args.passengers, args.load, args.algorithms, args.scenarios, args.seed)
+    start = time.perf_counter()
+    count = sweep(cells, args.out, args.workers)
+    print("%d cells run (%d already done) in %.1f s" % (count, len(cells) - count, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
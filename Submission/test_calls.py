@@ -0,0 +1,89 @@
+"""Checks of the call indexes: the counts, bitset and total of a FloorSet stay in step through adds and removes,
+and the closest floors above and below are found.
+
+    python -m pytest test_calls.py
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from calls import CallIndex, FloorSet
+
+
+def check(calls, expected):
+    assert calls.counts == [expected[floor] for floor in range(len(calls.counts))]
+    assert list(calls) == sorted(floor for floor in expected if expected[floor])
+    assert calls.total == sum(expected.values())
+    assert len(calls) == len(list(calls))
+    assert bool(calls) == (calls.total > 0)
+
+
+def test_add_and_remove():
+    calls = FloorSet(8)
+    for floor in (3, 3, 5, 0):
+        calls.add(floor)
+    check(calls, Counter({3: 2, 5: 1, 0: 1}))
+    calls.remove(3)
+    check(calls, Counter({3: 1, 5: 1, 0: 1}))
+    assert 3 in calls
+    calls.remove(3)
+    check(calls, Counter({5: 1, 0: 1}))
+    assert 3 not in calls
+
+
+def test_remove_many_at_once():
+    calls = FloorSet(4)
+    for _ in range(5):
+        calls.add(2)
+    calls.remove(2, 5)
+    check(calls, Counter())
+    calls.remove(2, 0)
+    check(calls, Counter())
+
+
+def test_clear():
+    calls = FloorSet(4)
+    calls.add(1)
+    calls.add(3)
+    calls.clear()
+    check(calls, Counter())
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_adds_and_removes(seed):
+    rng = random.Random(seed)
+    calls = FloorSet(16)
+    expected = Counter()
+    for _ in range(200):
+        floor = rng.randrange(16)
+        if expected[floor] and rng.random() < 0.5:
+            n = rng.randint(1, expected[floor])
+            calls.remove(floor, n)
+            expected[floor] -= n
+        else:
+            calls.add(floor)
+            expected[floor] += 1
+        check(calls, expected)
+
+
+def test_above_and_below():
+    calls = FloorSet(10)
+    for floor in (2, 6):
+        calls.add(floor)
+    assert [calls.above(floor) for floor in range(10)] == [2, 2, 6, 6, 6, 6, None, None, None, None]
+    assert [calls.below(floor) for floor in range(10)] == [None, None, None, 2, 2, 2, 2, 6, 6, 6]
+
+
+def test_call_index():
+    calls = CallIndex(10)
+    calls.hall[1].add(7)
+    calls.hall[0].add(1)
+    calls.car.add(4)
+    assert calls.mask() == 1 << 7 | 1 << 1 | 1 << 4
+    assert calls.mask(hall=False) == 1 << 4
+    assert calls.above(4) == 7 and calls.above(2, hall=False) == 4
+    assert calls.below(4) == 1 and calls.below(9, hall=False) == 4
+    calls.clear()
+    assert calls.mask() == 0 and calls.hall[1].total == 0
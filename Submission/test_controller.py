@@ -0,0 +1,111 @@
+"""Checks of the protocol of the live controller: replies to good and bad calls, and car calls made while a lift
+is moving. The controller is driven without a socket, its clock stopped (speed 0).
+
+    python -m pytest test_controller.py
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from controller import Controller
+
+
+class Writer:
+    """Keeps the replies of the controller to one client."""
+
+    def __init__(self):
+        self.replies = []
+        self.closed = False
+
+    def is_closing(self):
+        return self.closed
+
+    def write(self, data):
+        self.replies.extend(json.loads(line) for line in data.decode().splitlines())
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def reply_to(controller, message):
+    writer = Writer()
+    controller.handle(message, writer)
+    assert len(writer.replies) == 1
+    return writer.replies[0]
+
+
+@pytest.fixture
+def controller():
+    return Controller(floors=10, cars=2, speed=0.0)
+
+
+@pytest.mark.parametrize("message", [[1, 2], 3, "x", None])
+def test_message_not_an_object(controller, message):
+    assert reply_to(controller, message) == {"op": "error", "id": None, "message": "not a JSON object"}
+
+
+def test_bad_lines_do_not_close_the_connection(controller):
+    reader = asyncio.StreamReader()
+    for line in (b"[1, 2]\n", b"not json\n", b'{"op": "hall", "id": 7, "floor": 0, "to": 3}\n'):
+        reader.feed_data(line)
+    reader.feed_eof()
+    writer = Writer()
+    asyncio.run(controller.serve_client(reader, writer))
+    assert [reply["op"] for reply in writer.replies] == ["error", "error", "assigned"]
+    assert writer.replies[2]["id"] == 7
+
+
+@pytest.mark.parametrize("field", ["to", "floor"])
+@pytest.mark.parametrize("value", [3.7, True, "3", None])
+def test_floors_must_be_integers(controller, field, value):
+    message = {"op": "hall", "id": 1, "floor": 0, "to": 3}
+    message[field] = value
+    reply = reply_to(controller, message)
+    assert reply["op"] == "error" and reply["message"].startswith("bad call")
+
+
+@pytest.mark.parametrize("message", [{"op": "hall", "id": 1, "floor": 0, "to": 10},
+                                     {"op": "car", "id": 1, "car": 2, "to": 3},
+                                     {"op": "lift", "id": 1}])
+def test_no_such_floor_lift_or_op(controller, message):
+    assert reply_to(controller, message)["op"] == "error"
+
+
+def test_hall_call_assigned(controller):
+    reply = reply_to(controller, {"op": "hall", "id": 1, "floor": 2, "to": 5})
+    assert reply["op"] == "assigned" and reply["id"] == 1
+    lift = controller.sim.cars[reply["car"]]
+    assert lift.floor_list[2][1]
+
+
+def test_car_call_to_the_floor_of_a_stopped_lift(controller):
+    lift = controller.sim.cars[0]
+    rows = len(lift.allcustomer)
+    reply = reply_to(controller, {"op": "car", "id": 1, "car": 0, "to": lift.cur_floor})
+    assert reply == {"op": "error", "id": 1, "message": "lift 0 is already at floor %d" % lift.cur_floor}
+    assert len(lift.allcustomer) == rows
+
+
+def test_car_calls_of_a_moving_lift(controller):
+    sim = controller.sim
+    lift = sim.cars[reply_to(controller, {"op": "hall", "id": 1, "floor": 5, "to": 8})["car"]]
+    while not lift.moving:
+        assert sim.step()
+    i = sim.cars.index(lift)
+    left, going = lift.cur_floor, lift.next_floor
+    rows = len(lift.allcustomer)
+
+    # the lift stops at the floor it is going to anyway: nothing to add
+    assert reply_to(controller, {"op": "car", "id": 2, "car": i, "to": going})["op"] == "assigned"
+    assert len(lift.allcustomer) == rows
+
+    # the floor it just left: the customer rides from the next floor and back
+    assert reply_to(controller, {"op": "car", "id": 3, "car": i, "to": left})["op"] == "assigned"
+    handle = len(lift.allcustomer) - 1
+    assert (lift.allcustomer.cur_floor[handle], lift.allcustomer.dst_floor[handle]) == (going, left)
+    assert not lift.allcustomer.finished[handle] and handle in lift.elevator_customer
@@ -0,0 +1,67 @@
+"""Checks of the timing of the engine: the doors open, stay open and close in simulated time, and events happening
+at the same time are handled in the order they were scheduled.
+
+    python -m pytest test_engine.py
+"""
+
+from engine import (ALIGHT, ARRIVE, BOARD, CLOSE, CLOSED, CLOSING, DEPART, IDLE, MOVING, OPEN, OPENING, MechaCar,
+                    Simulation)
+from passengers import PassengerTable
+
+
+def states_of(sim):
+    """(time, event, state of the lift after it) of every event of the only lift of sim."""
+    car = sim.cars[0]
+    states = []
+    while sim.events:
+        kind = sim.events[0][2]
+        sim.step()
+        states.append((sim.now, kind, car.state))
+    return states
+
+
+def test_one_trip():
+    sim = Simulation(10, PassengerTable.from_columns([0], [3]), [MechaCar], floor_time=1.0, door_time=1.0,
+                     dwell_time=2.0)
+    assert states_of(sim) == [(0.0, BOARD, OPEN), (2.0, CLOSE, CLOSING), (3.0, DEPART, MOVING),
+                              (6.0, ARRIVE, OPENING), (7.0, ALIGHT, OPEN), (7.0, BOARD, OPEN),
+                              (9.0, CLOSE, CLOSING), (10.0, DEPART, CLOSED)]
+    car = sim.cars[0]
+    assert car.direction == IDLE
+    assert (car.allcustomer.board_time[0], car.allcustomer.alight_time[0]) == (0.0, 7.0)
+
+
+def test_times_follow_the_durations():
+    sim = Simulation(10, PassengerTable.from_columns([0], [3]), [MechaCar], floor_time=2.0, door_time=0.5,
+                     dwell_time=3.0)
+    sim.run()
+    # dwell, closing, three floors, opening
+    assert sim.cars[0].allcustomer.alight_time[0] == 3.0 + 0.5 + 3 * 2.0 + 0.5
+
+
+class Trace:
+    """Keeps the records of a simulation in memory, as record.RecordWriter would write them."""
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, time, kind, origin, destination=-1, passenger=-1, car=-1):
+        self.records.append((time, kind, passenger))
+
+
+def test_same_time_in_order():
+    trace = Trace()
+    arrivals = [(0.0, 0, 3), (1.0, 3, 6), (1.0, 3, 5)]
+    Simulation(10, [], [MechaCar], arrivals=arrivals, trace=trace).run()
+    at_floor_3 = [(kind, passenger) for time, kind, passenger in trace.records if time == 7.0]
+    # out before in, and the customers who called at the same time get in in the order they called
+    assert at_floor_3 == [(ALIGHT, 0), (BOARD, 1), (BOARD, 2)]
+
+
+def test_calls_at_open_doors():
+    # the lift stands open at the ground floor until 2.0: those calling there meanwhile get in at once
+    sim = Simulation(10, [], [MechaCar], arrivals=[(1.0, 0, 5), (1.5, 0, 3), (2.5, 0, 4)]).run()
+    customers = sim.cars[0].allcustomer
+    assert list(customers.board_time)[:2] == [1.0, 1.5]
+    # the doors are closing: the last one waits for them to open again
+    assert customers.board_time[2] == 4.0
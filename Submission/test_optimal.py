@@ -0,0 +1,48 @@
+"""Checks of the offline solver on small random scenarios: the exact optimum is never worse than what the lifts of
+the engine do, and beam search stays between the lower bound and the exact optimum.
+
+    python -m pytest test_optimal.py
+"""
+
+import random
+
+import pytest
+
+from engine import CARS, Simulation
+from optimal import OBJECTIVES, Solver
+from passengers import PassengerTable
+
+# scenarios checked: floors, customers and load are drawn at random for every seed
+SEEDS = range(200)
+
+
+def make_scenario(seed):
+    rng = random.Random(seed)
+    floors = rng.randint(2, 8)
+    load = rng.randint(1, 4)
+    customers = PassengerTable.random(floors, rng.randint(1, 6), rng)
+    return floors, customers, load
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_exact_cost_not_above_engine(seed):
+    floors, customers, load = make_scenario(seed)
+    sim = Simulation(floors, customers, list(CARS.values()), load=load).run()
+    solution = Solver(floors, customers, load).solve(exact=True)
+    assert solution.exact
+    for car in sim.cars:
+        assert car.finished_customer == sum(customers.cur_floor[h] != customers.dst_floor[h]
+                                            for h in range(len(customers)))
+        assert solution.cost <= car.cost, car.name
+
+
+@pytest.mark.parametrize("objective", OBJECTIVES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_beam_between_bound_and_exact(seed, objective):
+    floors, customers, load = make_scenario(seed)
+    exact = Solver(floors, customers, load, objective).solve(exact=True)
+    # a narrow beam, so that it does not always find the optimum
+    beam = Solver(floors, customers, load, objective).solve(exact=False, width=2)
+    assert not beam.exact
+    assert beam.bound <= exact.cost + 1e-9
+    assert exact.cost <= beam.cost + 1e-9
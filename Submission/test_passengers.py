@@ -0,0 +1,90 @@
+"""Checks of the customer table: its columns, compaction with keep, and lifts forgetting the customers they have
+delivered (reclaim) without changing the results of a simulation.
+
+    python -m pytest test_passengers.py
+"""
+
+import pytest
+
+from engine import CARS, Simulation
+from passengers import DOWN, IDLE, UP, PassengerTable
+
+
+def test_add():
+    table = PassengerTable()
+    assert table.add(0, 5, arrival_time=1.5) == 0
+    assert table.add(4, 2, ID=17) == 1
+    assert table.add(3, 3) == 2
+    assert len(table) == 3
+    assert list(table.ID) == [0, 17, 2]
+    assert list(table.direction) == [UP, DOWN, IDLE]
+    assert list(table.finished) == [False, False, True]
+    assert list(table.arrival_time) == [1.5, 0.0, 0.0]
+    assert list(table.board_time) == list(table.alight_time) == [-1.0] * 3
+
+
+def test_arrive():
+    table = PassengerTable()
+    table.add(0, 5)
+    table.arrive(0, 3, now=4.0)
+    assert (table.cur_floor[0], table.direction[0], table.finished[0], table.alight_time[0]) == (3, UP, False, 4.0)
+    table.arrive(0, 5, now=6.0)
+    assert (table.cur_floor[0], table.direction[0], table.finished[0], table.alight_time[0]) == (5, IDLE, True, 6.0)
+
+
+def test_keep():
+    table = PassengerTable.from_columns([0, 1, 2, 3], [4, 5, 6, 7], [0.5, 1.5, 2.5, 3.5])
+    table.keep([1, 3])
+    assert len(table) == 2
+    assert list(table.ID) == [1, 3]
+    assert list(table.cur_floor) == [1, 3] and list(table.dst_floor) == [5, 7]
+    assert list(table.arrival_time) == [1.5, 3.5]
+    # customers added later are numbered after all those ever added
+    assert table.add(0, 1) == 2
+    assert table.ID[2] == 4
+
+
+def test_extend_and_copy():
+    table = PassengerTable.random(10, 5, rng=1)
+    copy = table.copy()
+    copy.add(0, 1)
+    assert len(table) == 5 and len(copy) == 6
+    assert list(copy.cur_floor[:5]) == list(table.cur_floor)
+    assert copy.added == 6
+
+
+def test_random():
+    assert list(PassengerTable.random(10, 20, rng=3).dst_floor) == list(PassengerTable.random(10, 20, rng=3).dst_floor)
+    table = PassengerTable.random(10, 50, rng=3, spread=60.0)
+    assert all(0 <= floor < 10 for floor in table.cur_floor)
+    assert all(0.0 <= time <= 60.0 for time in table.arrival_time)
+
+
+def test_from_customers():
+    table = PassengerTable.random(10, 5, rng=2)
+    assert PassengerTable.from_customers(table) is table
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_reclaim_keeps_the_results(seed):
+    table = PassengerTable.random(12, 200, rng=seed, spread=300.0)
+    calls = sorted(zip(table.arrival_time, table.cur_floor, table.dst_floor))
+    results = []
+    for reclaim in (False, True):
+        sim = Simulation(12, [], list(CARS.values()), arrivals=calls)
+        for until in (100.0, 200.0, 300.0):
+            sim.run(until)
+            if reclaim:
+                for car in sim.cars:
+                    waiting = [car.allcustomer.ID[handle] for queues in car.floor_list for queue in queues
+                               for handle in queue]
+                    inside = [car.allcustomer.ID[handle] for handle in car.elevator_customer]
+                    car.reclaim()
+                    assert len(car.allcustomer) == len(waiting) + len(inside)
+                    assert not any(car.allcustomer.finished)
+                    assert [car.allcustomer.ID[handle] for queues in car.floor_list for queue in queues
+                            for handle in queue] == waiting
+                    assert [car.allcustomer.ID[handle] for handle in car.elevator_customer] == inside
+        sim.run()
+        results.append([(car.cost, car.floor_count, car.finished_customer) for car in sim.cars])
+    assert results[0] == results[1]
@@ -0,0 +1,66 @@
+"""Checks of the record files: a scenario written and replayed gives back the same calls, across chunks, and a
+replay through the engine writes a trace with every customer getting in and out once per lift.
+
+    python -m pytest test_record.py
+"""
+
+import numpy as np
+import pytest
+
+import record
+from engine import ALIGHT, ARRIVE, BOARD, CARS, Simulation
+from passengers import PassengerTable
+from record import RecordWriter, open_records, replay, write_scenario
+
+
+def make_arrivals(count, floors=10, seed=0):
+    table = PassengerTable.random(floors, count, rng=seed, spread=100.0)
+    return sorted(zip(table.arrival_time, table.cur_floor, table.dst_floor))
+
+
+@pytest.mark.parametrize("count", [0, 1, 7, 50])
+def test_round_trip(tmp_path, monkeypatch, count):
+    # small chunks, so that the calls are written and read in several of them
+    monkeypatch.setattr(record, "CHUNK", 7)
+    path = str(tmp_path / "scenario.rec")
+    arrivals = make_arrivals(count)
+    assert write_scenario(path, 10, arrivals) == count
+    floors, records = open_records(path)
+    assert floors == 10 and len(records) == count
+    assert list(replay(path)) == [arrival + (passenger,) for passenger, arrival in enumerate(arrivals)]
+
+
+def test_not_a_record_file(tmp_path):
+    path = tmp_path / "other.rec"
+    path.write_bytes(b"something else entirely")
+    with pytest.raises(ValueError):
+        open_records(str(path))
+
+
+def test_other_record_size(tmp_path):
+    path = str(tmp_path / "scenario.rec")
+    write_scenario(path, 10, make_arrivals(3))
+    data = bytearray(open(path, "rb").read())
+    data[12:16] = np.array([record.RECORD.itemsize + 8], "<u4").tobytes()
+    open(path, "wb").write(bytes(data))
+    with pytest.raises(ValueError):
+        open_records(path)
+
+
+def test_trace_of_a_replay(tmp_path):
+    scenario = str(tmp_path / "scenario.rec")
+    arrivals = [arrival for arrival in make_arrivals(40) if arrival[1] != arrival[2]]
+    write_scenario(scenario, 10, arrivals)
+    path = str(tmp_path / "trace.rec")
+    with RecordWriter(path, 10) as trace:
+        sim = Simulation(10, (), list(CARS.values()), arrivals=replay(scenario), trace=trace, reclaim=True).run()
+    _, records = open_records(path)
+    for index, car in enumerate(sim.cars):
+        mine = records[records["car"] == index]
+        for kind in (BOARD, ALIGHT):
+            assert sorted(mine[mine["kind"] == kind]["passenger"].tolist()) == list(range(len(arrivals)))
+        alight = mine[mine["kind"] == ALIGHT]
+        assert alight["origin"].tolist() == alight["destination"].tolist()
+        assert (mine["kind"] == ARRIVE).sum() == car.floor_count
+    # a trace has no calls
+    assert list(replay(path)) == []
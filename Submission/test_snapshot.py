@@ -0,0 +1,80 @@
+"""Checks of snapshots: a simulation restored from a snapshot ends exactly as the same simulation run without
+a break, for every dispatcher of a group and in comparison mode (every lift on its own copy of the customers).
+
+    python -m pytest test_snapshot.py
+"""
+
+import pytest
+
+import engine
+from engine import CARS, Simulation
+from group import DISPATCHERS, GroupSimulation
+from profiling import Profiler
+from snapshot import dumps, loads, office_arrivals, restore, take
+
+FLOORS = 20
+# times of the snapshots, from the first minutes to after the end of the arrivals
+TIMES = (5.0, 300.0, 3600.0, 50000.0)
+
+
+def result_of(sim):
+    return [(car.cost, car.floor_count, car.finished_customer, list(car.allcustomer.board_time),
+             list(car.allcustomer.alight_time)) for car in sim.cars]
+
+
+def group(dispatcher, reclaim=False):
+    return GroupSimulation(FLOORS, (), (CARS["MyCar"],) * 4, dispatcher=DISPATCHERS[dispatcher],
+                           arrivals=office_arrivals(FLOORS, 400, 3), reclaim=reclaim)
+
+
+def comparison(reclaim=False):
+    return Simulation(FLOORS, (), list(CARS.values()), arrivals=office_arrivals(FLOORS, 200, 4), reclaim=reclaim)
+
+
+@pytest.mark.parametrize("at", TIMES)
+@pytest.mark.parametrize("dispatcher", DISPATCHERS)
+def test_restored_group_ends_as_uninterrupted(dispatcher, at):
+    full = group(dispatcher).run()
+    part = group(dispatcher).run(at)
+    restored = restore(loads(dumps(take(part))), office_arrivals(FLOORS, 400, 3)).run()
+    assert result_of(restored) == result_of(full)
+    # taking the snapshot did not change the simulation
+    assert result_of(part.run()) == result_of(full)
+
+
+@pytest.mark.parametrize("at", TIMES)
+def test_restored_comparison_ends_as_uninterrupted(at):
+    full = comparison().run()
+    part = comparison().run(at)
+    restored = restore(loads(dumps(take(part))), office_arrivals(FLOORS, 200, 4)).run()
+    assert result_of(restored) == result_of(full)
+
+
+def test_restored_with_reclaim_delivers_everyone(monkeypatch):
+    # small enough for the delivered customers to be reclaimed before and after the snapshot
+    monkeypatch.setattr(engine, "RECLAIM_MIN", 16)
+    full = comparison(reclaim=True).run()
+    part = comparison(reclaim=True).run(3600.0)
+    assert all(car.reclaimed for car in part.cars)
+    restored = restore(loads(dumps(take(part))), office_arrivals(FLOORS, 200, 4)).run()
+    assert [(car.cost, car.floor_count, car.finished_customer) for car in restored.cars] == \
+        [(car.cost, car.floor_count, car.finished_customer) for car in full.cars]
+
+
+def test_snapshot_not_changed_by_the_run():
+    sim = group("eta").run(3600.0)
+    state = take(sim)
+    data = dumps(state)
+    sim.run()
+    assert dumps(state) == data
+
+
+def test_instrumented_simulation_restores_its_strategies():
+    sim = comparison()
+    Profiler().instrument(sim)
+    sim.run(300.0)
+    state = take(sim)
+    assert [car["strategy"] for car in state["cars"]] == [car.strategy.strategy.name for car in sim.cars]
+    restored = restore(state, office_arrivals(FLOORS, 200, 4))
+    assert [car.strategy.name for car in restored.cars] == [car["strategy"] for car in state["cars"]]
+    assert result_of(restored.run()) == result_of(comparison().run())
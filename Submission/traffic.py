@@ -0,0 +1,163 @@
+"""Traffic patterns: customers arriving over time instead of all at the start.
+
+Arrivals are python generators yielding (time, cur_floor, dst_floor) sorted by time. They are lazy,
+so the simulation reads them one at a time (see the arrivals argument of engine.Simulation) and a
+day-long scenario is never held in memory. Where customers go is given by an origin/destination
+matrix (ODMatrix), and how many arrive by a rate that can change over the day.
+
+    python traffic.py --floors 20 --cars 4 --population 800
+"""
+
+import argparse
+import bisect
+import itertools
+import math
+import random
+
+
+class ODMatrix:
+    """Origin/destination matrix: weights[o][d] is the relative number of trips from floor o to floor d."""
+
+    def __init__(self, weights):
+
+        """Initialisation of the class. The cumulated weights are computed once so that sampling is a binary search."""
+
+        self.num_of_floors = len(weights)
+        self.weights = [[float(w) if o != d else 0.0 for d, w in enumerate(row)] for o, row in enumerate(weights)]
+        self.cum_weights = list(itertools.accumulate(w for row in self.weights for w in row))
+
+    def sample(self, rng=random):
+
+        """Draws one trip. Returns (cur_floor, dst_floor)."""
+
+        index = bisect.bisect_right(self.cum_weights, rng.random() * self.cum_weights[-1])
+        return divmod(min(index, len(self.cum_weights) - 1), self.num_of_floors)
+
+    def mix(self, other, share):
+
+        """Returns a matrix with share of the trips drawn from other and the rest from this one."""
+
+        total = self.cum_weights[-1]
+        other_total = other.cum_weights[-1]
+        return ODMatrix([[(1 - share) * w / total + share * v / other_total for w, v in zip(row, other_row)]
+                         for row, other_row in zip(self.weights, other.weights)])
+
+
+def uniform(floors):
+
+    """Every trip between two different floors is as likely (what Customer does)."""
+
+    return ODMatrix([[1.0] * floors for _ in range(floors)])
+
+
+def up_peak(floors, lobby=0, share=0.9):
+
+    """Morning traffic: share of the trips go from the lobby to the other floors, the rest between floors."""
+
+    weights = [[(1 - share) / max(floors * (floors - 1), 1)] * floors for _ in range(floors)]
+    for d in range(floors):
+        if d != lobby:
+            weights[lobby][d] += share / (floors - 1)
+    return ODMatrix(weights)
+
+
+def down_peak(floors, lobby=0, share=0.9):
+
+    """Evening traffic: share of the trips go from the other floors to the lobby."""
+
+    weights = up_peak(floors, lobby, share).weights
+    return ODMatrix([[weights[d][o] for d in range(floors)] for o in range(floors)])
+
+
+def lunch(floors, lobby=0, share=0.8):
+
+    """Lunch time: trips to and from the lobby in both directions, and some between floors."""
+
+    return up_peak(floors, lobby, share).mix(down_peak(floors, lobby, share), 0.5)
+
+
+def poisson_arrivals(rate, od, start=0.0, end=math.inf, max_rate=None, rng=None):
+
+    """Poisson arrivals with a rate (customers per second) that can change over time.
+        rate is a number or a function of the time; for a function, max_rate must be an upper bound
+        of it and arrivals are drawn by thinning. od is an ODMatrix."""
+
+    rng = rng or random.Random()
+    if not callable(rate):
+        max_rate, rate = rate, None
+    elif max_rate is None:
+        raise ValueError("max_rate is needed when the rate changes over time")
+    if max_rate <= 0:
+        return
+    time = start
+    while True:
+        time += rng.expovariate(max_rate)
+        if time >= end:
+            return
+        if rate is None or rng.random() * max_rate < rate(time):
+            yield (time,) + od.sample(rng)
+
+
+def piecewise_arrivals(segments, rng=None):
+
+    """Arrivals following a schedule of (start, end, rate, od) segments, for example an empirical rate
+        measured every hour. Every segment can have its own matrix."""
+
+    rng = rng or random.Random()
+    for start, end, rate, od in segments:
+        yield from poisson_arrivals(rate, od, start, end, rng=rng)
+
+
+def office_day(floors, population, lobby=0):
+
+    """Segments of a working day (times in seconds from 7:00) for a building of population people:
+        morning up-peak, lunch two-way traffic, evening down-peak and light traffic between floors otherwise."""
+
+    hour = 3600.0
+    base = uniform(floors)
+    return [
+        (0 * hour, 1 * hour, 0.3 * population / hour, up_peak(floors, lobby)),
+        (1 * hour, 2 * hour, 0.6 * population / hour, up_peak(floors, lobby)),
+        (2 * hour, 5 * hour, 0.05 * population / hour, base),
+        (5 * hour, 7 * hour, 0.5 * population / hour, lunch(floors, lobby)),
+        (7 * hour, 10 * hour, 0.05 * population / hour, base),
+        (10 * hour, 11 * hour, 0.6 * population / hour, down_peak(floors, lobby)),
+        (11 * hour, 12 * hour, 0.3 * population / hour, down_peak(floors, lobby)),
+    ]
+
+
+def main():
+    from engine import CARS
+    from group import GroupSimulation
+    from metrics import Metrics
+
+    parser = argparse.ArgumentParser(description="Simulate an office day with a group of lifts.")
+    parser.add_argument("--floors", type=int, default=20)
+    parser.add_argument("--cars", type=int, default=4)
+    parser.add_argument("--algorithm", default="MyCar", choices=list(CARS))
+    parser.add_argument("--population", type=int, default=800)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--metrics", default=None, help="write latency percentiles by floor to this .jsonl or .csv file")
+    args = parser.parse_args()
+
+    arrivals = piecewise_arrivals(office_day(args.floors, args.population), random.Random(args.seed))
+    metrics = Metrics()
+    sim = GroupSimulation(args.floors, (), (CARS[args.algorithm],) * args.cars, arrivals=arrivals,
+                          metrics=metrics).run()
+
+    # mean wait of the customers by hour of arrival
+    waits = {}
+    for car in sim.cars:
+        customers = car.allcustomer
+        for handle in range(len(customers)):
+            hour = int(customers.arrival_time[handle] // 3600)
+            waits.setdefault(hour, []).append(customers.board_time[handle] - customers.arrival_time[handle])
+    for hour in sorted(waits):
+        print("%02d:00  %5d customers  mean wait %6.1f s" % (7 + hour, len(waits[hour]), sum(waits[hour]) / len(waits[hour])))
+    metrics.print_report()
+    if args.metrics:
+        metrics.export(args.metrics)
+
+
+if __name__ == "__main__":
+    main()